@@ -1,228 +1,128 @@
+import json
+import time
+
 import streamlit as st
-import pandas as pd
-import re
+
+from lesson_conflicts import find_conflicts, summarize_conflicts
+from lesson_query import (
+    DISPLAY_COLUMNS, DataLoadError, DataPaths, QueryCache, cached_filter_rows, find_free_rooms,
+    normalize_filter_state, render_timetable, start_data_reloader,
+)
+from perf_timing import TOTAL_STAGE, RerunTimer, TimingStats
 
 # ===========================================
 # 配置文件路径
 # ===========================================
 COURSE_DATA_PATH = "lessons_list_dedup.csv"
+COMPILED_DATA_PATH = "lessons_list_dedup.feather"  # 爬虫生成的预编译课程文件，比 CSV 新时优先读取
 CLASSROOM_LIST_PATH = "classroom_list.txt"
 
+# 以上数据文件变化后，后台线程自动重新加载；检查间隔（秒）
+DATA_RELOAD_INTERVAL = 5
+
+# 筛选结果缓存：所有会话共享，最多保存的查询数和每条的有效期（秒）
+QUERY_CACHE_SIZE = 512
+QUERY_CACHE_TTL = 600
+
+# 页面各阶段耗时统计（所有会话共享，在侧边栏勾选“显示性能面板”查看）；
+# 每次运行的明细追加到该文件（JSON Lines），None 表示不写日志
+TIMING_LOG_PATH = None
+
 # ===========================================
-# 加载并结构化教室列表（仅用于构建三级菜单）
+# 加载课程数据（CSV 中上课地点 = 教室名）
+# 课程表、各种索引和教室列表只读、由所有会话共享，数据文件被重新生成后由后台线程重新加载并整体替换
+# 数据加载、筛选和课表渲染都在 lesson_query 中，与 HTTP 接口（lesson_api.py）共用
 # ===========================================
-@st.cache_data
-def load_classrooms_structured():
+@st.cache_resource
+def get_data_reloader():
+    """首次访问时加载数据并启动后台检查线程，之后所有会话共享"""
+    return start_data_reloader(
+        DataPaths(COURSE_DATA_PATH, COMPILED_DATA_PATH, CLASSROOM_LIST_PATH), DATA_RELOAD_INTERVAL
+    )
+
+@st.cache_resource
+def get_query_cache():
+    """筛选结果缓存，所有会话共享同一个实例"""
+    return QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+@st.cache_data(max_entries=256)
+def render_timetable_cached(data_version, filter_state, _filtered_df):
     """
-    从 classroom.txt 读取，格式：主校区:教学楼:教101
-    返回 structured: {校区: {楼宇: [教室名1, 教室名2, ...]}}
+    以 (数据版本, 规范化的筛选条件) 作为缓存键：两者相同则筛选结果相同，
+    同一周的重复查看以及其他用户的相同查询直接复用已生成的 HTML（_filtered_df 不参与哈希）
     """
-    try:
-        with open(CLASSROOM_LIST_PATH, "r", encoding="utf-8-sig") as f:
-            lines = f.readlines()
-    except FileNotFoundError:
-        st.error(f"❌ 未找到文件 `{CLASSROOM_LIST_PATH}`")
-        st.stop()
-    
-    structured = {}
-    valid_count = 0
-
-    for line in lines:
-        # 去除首尾空白 + BOM
-        full_name = line.strip().lstrip('\ufeff')
-        if not full_name:
-            continue
-        
-        parts = full_name.split(":", 2)  # 最多分3段
-        if len(parts) < 3:
-            # 可选：打印警告（调试用）
-            # st.warning(f"⚠️ 跳过无效行: {full_name}")
-            continue
-        
-        campus, building, room = parts[0].strip(), parts[1].strip(), parts[2].strip()
-        if not (campus and building and room):
-            continue
-
-        if campus not in structured:
-            structured[campus] = {}
-        if building not in structured[campus]:
-            structured[campus][building] = set()
-        structured[campus][building].add(room)
-        valid_count += 1
-
-    if valid_count == 0:
-        st.error(f"❌ `{CLASSROOM_LIST_PATH}` 中没有有效数据。请确保每行格式为：`校区:楼宇:教室名`")
-        st.stop()
-
-    # 转为排序列表
-    for campus in structured:
-        for building in structured[campus]:
-            structured[campus][building] = sorted(structured[campus][building])
-        structured[campus] = dict(sorted(structured[campus].items()))
-    structured = dict(sorted(structured.items()))
-
-    return structured
+    return render_timetable(_filtered_df)
 
-# ===========================================
-# 工具函数（周次、节次、星期）
-# ===========================================
-def parse_weeks(week_str):
-    if not week_str or str(week_str).strip().lower() in ("null", "", "无"):
-        return set()
-    weeks = set()
-    normalized = str(week_str).replace('；', ';').replace(';', ',')
-    parts = [p.strip() for p in normalized.split(',') if p.strip()]
-    range_pattern = re.compile(r'^\[(\d+)-(\d+)\](.*)$')
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-        match = range_pattern.match(part)
-        if match:
-            start = int(match.group(1))
-            end = int(match.group(2))
-            suffix = match.group(3).strip()
-            week_range = list(range(start, end + 1))
-            if '单' in suffix:
-                selected = [w for w in week_range if w % 2 == 1]
-            elif '双' in suffix:
-                selected = [w for w in week_range if w % 2 == 0]
-            else:
-                selected = week_range
-            weeks.update(selected)
-        elif part.isdigit():
-            weeks.add(int(part))
-    return weeks
-
-def extract_periods(period_str):
-    if not isinstance(period_str, str) or period_str.strip().lower() in ("null", "", "无"):
-        return set()
-    match = re.search(r'\[(\d+)-(\d+)\]', period_str.strip())
-    if match:
-        a, b = int(match.group(1)), int(match.group(2))
-        if a <= b:
-            return set(range(a, b + 1))
-    return set()
-
-def normalize_weekday(raw):
-    if pd.isna(raw) or str(raw).strip().lower() in ("null", "", "无"):
-        return None
-    s = str(raw).strip()
-    mapping = {
-        "星期日": "日",
-        "星期一": "一",
-        "星期二": "二",
-        "星期三": "三",
-        "星期四": "四",
-        "星期五": "五",
-        "星期六": "六"
-    }
-    return mapping.get(s)
-
-WEEKDAY_TO_COL = {"日": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6}
+@st.cache_resource
+def get_timing_stats():
+    """各阶段耗时统计，所有会话共享同一个实例"""
+    return TimingStats(log_path=TIMING_LOG_PATH)
 
 # ===========================================
-# 渲染课表 HTML
+# 排课冲突（首次切换到该模式时才检测）
 # ===========================================
-def render_timetable(filtered_df):
-    grid = [[[] for _ in range(7)] for _ in range(12)]
-
-    for _, row in filtered_df.iterrows():
-        raw_weekday = row.get("星期", "")
-        period_str = str(row.get("节次", ""))
-        course_name = str(row.get("课程名称", "未知课程"))
-
-        weekday_norm = normalize_weekday(raw_weekday)
-        if weekday_norm is None:
-            continue
-
-        col = WEEKDAY_TO_COL[weekday_norm]
-        periods = extract_periods(period_str)
-
-        for p in periods:
-            if 1 <= p <= 12:
-                grid[p - 1][col].append(course_name)
-
-    html = """
-    <style>
-    .timetable {
-        width: 100%;
-        border-collapse: collapse;
-        font-size: 12px;
-        table-layout: fixed;
-    }
-    .timetable th,
-    .timetable td {
-        border: 1px solid #ccc;
-        padding: 6px;
-        text-align: center;
-        vertical-align: top;
-        height: 60px;
-        word-wrap: break-word;
-    }
-    .timetable th {
-        background-color: #e0e0e0;
-        color: white;
-        font-weight: bold;
-    }
-    .has-course {
-        background-color: #1E90FF;
-        color: white;
-        font-weight: bold;
-    }
-    </style>
-    <table class="timetable">
-      <thead>
-        <tr>
-          <th>节次</th>
-          <th>星期日</th>
-          <th>星期一</th>
-          <th>星期二</th>
-          <th>星期三</th>
-          <th>星期四</th>
-          <th>星期五</th>
-          <th>星期六</th>
-        </tr>
-      </thead>
-      <tbody>
-    """
-
-    for i in range(12):
-        html += f"<tr><td>{i + 1}</td>"
-        for j in range(7):
-            courses = grid[i][j]
-            if courses:
-                display_text = "<br>".join(courses[:2])
-                if len(courses) > 2:
-                    display_text += "<br>..."
-                html += f'<td class="has-course">{display_text}</td>'
-            else:
-                html += "<td></td>"
-        html += "</tr>"
-
-    html += "</tbody></table>"
-    return html
+@st.cache_resource(max_entries=1)
+def load_conflicts(data_version, _dataset):
+    return find_conflicts(_dataset.df)
 
 # ===========================================
-# 加载课程数据（CSV 中上课地点 = 教室名）
+# 性能面板
+# 每个阶段结束处调用 timer.lap(阶段名)；页面结束（或 st.stop）前调用 finish_rerun() 记录本次运行
 # ===========================================
-@st.cache_data
-def load_and_preprocess_data():
-    try:
-        df = pd.read_csv(COURSE_DATA_PATH, dtype=str)
-    except FileNotFoundError:
-        st.error(f"❌ 未找到文件 `{COURSE_DATA_PATH}`")
-        st.stop()
-    
-    required_cols = ["序号", "课程代码", "课程名称", "周次", "星期", "节次", "授课教师", "上课地点"]
-    missing = [col for col in required_cols if col not in df.columns]
-    if missing:
-        st.error(f"❌ CSV 缺少必要列: {missing}")
-        st.stop()
-    
-    df = df.fillna("null")
-    df['_parsed_weeks'] = df['周次'].apply(parse_weeks)
-    return df
+def finish_rerun(timer):
+    """记录本次运行的各阶段耗时；勾选了“显示性能面板”时在侧边栏显示本次明细和所有会话的汇总"""
+    record = timer.record()
+    timing_stats = get_timing_stats()
+    timing_stats.add(record)
+    if not st.session_state.get("perf_panel_checkbox"):
+        return
+
+    with st.sidebar.expander("⏱️ 性能面板", expanded=True):
+        st.markdown(f"**本次运行：{record['total_ms']:.1f} ms**")
+        st.dataframe(
+            [{"阶段": stage, "耗时 ms": ms} for stage, ms in record['stages'].items()],
+            use_container_width=True, hide_index=True
+        )
+
+        st.markdown(f"**所有会话（共 {timing_stats.reruns} 次运行）**")
+        st.dataframe(timing_stats.summary(), use_container_width=True, hide_index=True)
+
+        stages = timing_stats.stages()
+        stage = st.selectbox("耗时分布", options=stages, index=stages.index(TOTAL_STAGE), key="perf_stage_select")
+        histogram = timing_stats.histogram(stage)
+        st.dataframe(
+            [{"耗时": label, "次数": count} for label, count in histogram.items()],
+            column_config={"次数": st.column_config.ProgressColumn(
+                "次数", min_value=0, max_value=max(1, max(histogram.values())), format="%d"
+            )},
+            use_container_width=True, hide_index=True
+        )
+
+        st.markdown("**最慢的运行**")
+        st.dataframe([
+            {
+                "时间": time.strftime("%m-%d %H:%M:%S", time.localtime(slow['time'])),
+                "总计 ms": slow['total_ms'],
+                "最慢阶段": max(slow['stages'], key=slow['stages'].get) if slow['stages'] else "",
+                "模式": slow.get('mode', ""),
+                "周次": slow.get('week', ""),
+                "结果行数": slow.get('rows', ""),
+            }
+            for slow in timing_stats.slowest()
+        ], use_container_width=True, hide_index=True)
+
+        cache_stats = get_query_cache().stats()
+        st.caption(
+            f"筛选缓存：命中 {cache_stats['hits']} 次，未命中 {cache_stats['misses']} 次，"
+            f"命中率 {cache_stats['hit_rate']:.0%}，缓存 {cache_stats['size']} 条；"
+            f"数据已重新加载 {get_data_reloader().reloads} 次"
+        )
+        st.download_button(
+            "导出耗时统计（JSON）",
+            data=json.dumps(timing_stats.export(), ensure_ascii=False, indent=2),
+            file_name="webapp_timing.json",
+            mime="application/json",
+        )
 
 # ===========================================
 # 主程序
@@ -230,18 +130,30 @@ def load_and_preprocess_data():
 st.set_page_config(page_title="课程检索系统", layout="wide")
 st.title("📚 课程多维检索系统")
 
-df = load_and_preprocess_data()
-structured_classrooms = load_classrooms_structured()
-if not structured_classrooms:
+timer = RerunTimer()
+try:
+    app_data = get_data_reloader().current
+except DataLoadError as e:
+    st.error(f"❌ {e}")
     st.stop()
+timer.lap("加载数据")
+dataset = app_data.dataset
+df = dataset.df
+structured_classrooms = app_data.classrooms
 
 # ========== 初始化状态 ==========
+if 'query_mode' not in st.session_state:
+    st.session_state.query_mode = "课程检索"
 if 'current_week' not in st.session_state:
     st.session_state.current_week = 1
 if 'course_name' not in st.session_state:
     st.session_state.course_name = ""
+if 'teacher_name' not in st.session_state:
+    st.session_state.teacher_name = ""
 if 'selected_periods' not in st.session_state:
     st.session_state.selected_periods = []
+if 'selected_weekdays' not in st.session_state:
+    st.session_state.selected_weekdays = []
 if 'selected_campus' not in st.session_state:
     st.session_state.selected_campus = ""
 if 'selected_building' not in st.session_state:
@@ -254,6 +166,16 @@ if 'location_input' not in st.session_state:
 # ========== 侧边栏 ==========
 st.sidebar.header("🔍 筛选条件")
 
+# 检索模式
+QUERY_MODES = ["课程检索", "空闲教室", "排课冲突"]
+st.session_state.query_mode = st.sidebar.radio(
+    "检索模式",
+    options=QUERY_MODES,
+    index=QUERY_MODES.index(st.session_state.query_mode),
+    horizontal=True,
+    key="query_mode_radio"
+)
+
 # 课程名称
 st.session_state.course_name = st.sidebar.text_input(
     "课程名称（模糊搜索）",
@@ -261,6 +183,13 @@ st.session_state.course_name = st.sidebar.text_input(
     key="course_name_input"
 )
 
+# 授课教师
+st.session_state.teacher_name = st.sidebar.text_input(
+    "授课教师（模糊搜索）",
+    value=st.session_state.teacher_name,
+    key="teacher_name_input"
+)
+
 # 周次控制
 col_prev, col_text, col_next = st.sidebar.columns([1, 2, 1])
 with col_prev:
@@ -292,6 +221,15 @@ st.session_state.selected_periods = st.sidebar.multiselect(
     key="periods_multiselect"
 )
 
+# 星期多选
+WEEKDAY_OPTIONS = ["星期日", "星期一", "星期二", "星期三", "星期四", "星期五", "星期六"]
+st.session_state.selected_weekdays = st.sidebar.multiselect(
+    "星期（可多选）",
+    options=WEEKDAY_OPTIONS,
+    default=st.session_state.selected_weekdays,
+    key="weekdays_multiselect"
+)
+
 # === 上课地点：三级菜单（仅导航，值 = 教室名）===
 st.sidebar.markdown("### 📍 上课地点")
 
@@ -341,60 +279,83 @@ st.session_state.location_input = st.sidebar.text_input(
 if st.sidebar.button("🔄 重置筛选"):
     st.session_state.current_week = 1
     st.session_state.course_name = ""
+    st.session_state.teacher_name = ""
     st.session_state.selected_periods = []
+    st.session_state.selected_weekdays = []
     st.session_state.selected_campus = ""
     st.session_state.selected_building = ""
     st.session_state.selected_room_name = ""
     st.session_state.location_input = ""
     st.rerun()
 
-# ========== 数据筛选 ==========
-filtered_df = df.copy()
+st.sidebar.checkbox("⏱️ 显示性能面板", key="perf_panel_checkbox")
+timer.lap("侧边栏")
+timer.info['mode'] = st.session_state.query_mode
+timer.info['week'] = st.session_state.current_week
+
+# ========== 空闲教室 ==========
+# 当前周、所选星期和节次（未选择时分别为整周、全部节次）中都没有课的教室，可按校区、楼宇缩小范围
+if st.session_state.query_mode == "空闲教室":
+    free_rooms = find_free_rooms(
+        app_data,
+        st.session_state.current_week,
+        [WEEKDAY_OPTIONS.index(w) for w in st.session_state.selected_weekdays],
+        st.session_state.selected_periods,
+        selected_campus,
+        selected_building,
+    )
+    timer.lap("空闲教室查询")
 
-# 课程名称
-if st.session_state.course_name:
-    filtered_df = filtered_df[
-        filtered_df['课程名称'].str.contains(st.session_state.course_name, case=False, na=False)
-    ]
-
-# 周次
-filtered_df = filtered_df[
-    filtered_df['_parsed_weeks'].apply(lambda ws: st.session_state.current_week in ws)
-]
-
-# 节次
-if st.session_state.selected_periods:
-    selected_set = {int(p) for p in st.session_state.selected_periods}
-    filtered_df = filtered_df[
-        filtered_df['节次'].apply(lambda x: bool(extract_periods(x) & selected_set))
-    ]
-
-# === 📍 上课地点：全部基于 df['上课地点']（即教室名）===
-manual_input = st.session_state.location_input.strip()
-selected_room = st.session_state.selected_room_name
-
-if manual_input:
-    # 模糊匹配教室名
-    filtered_df = filtered_df[
-        filtered_df['上课地点'].astype(str).str.contains(manual_input, case=False, na=False)
-    ]
-elif selected_room:
-    # 精确匹配教室名
-    filtered_df = filtered_df[
-        filtered_df['上课地点'].astype(str) == selected_room
-    ]
+    st.subheader(f"🏫 第 {st.session_state.current_week} 周共有 {len(free_rooms)} 间空闲教室")
+    st.dataframe(free_rooms, use_container_width=True, hide_index=True)
+    timer.lap("结果表格")
+    timer.info['rows'] = len(free_rooms)
+    finish_rerun(timer)
+    st.stop()
+
+# ========== 排课冲突 ==========
+# 同一教室、教师或教学班在周次重叠的同一时间段内有两门课，列出整个学期的冲突
+if st.session_state.query_mode == "排课冲突":
+    conflicts = load_conflicts(dataset.version, dataset)
+    timer.lap("排课冲突检测")
+    st.subheader(f"⚠️ 共发现 {len(conflicts)} 处排课冲突")
+    st.caption(summarize_conflicts(conflicts))
+    st.dataframe(conflicts, use_container_width=True, hide_index=True)
+    timer.lap("结果表格")
+    timer.info['rows'] = len(conflicts)
+    finish_rerun(timer)
+    st.stop()
+
+# ========== 数据筛选 ==========
+# 筛选条件规范化后作为缓存键，相同的查询（包括其他用户的）直接取缓存的行号
+filter_state = normalize_filter_state(
+    week=st.session_state.current_week,
+    course_name=st.session_state.course_name,
+    teacher_name=st.session_state.teacher_name,
+    periods=st.session_state.selected_periods,
+    weekdays=[WEEKDAY_OPTIONS.index(w) for w in st.session_state.selected_weekdays],
+    location=st.session_state.location_input,
+    room=st.session_state.selected_room_name,
+)
+filtered_df = df.iloc[cached_filter_rows(get_query_cache(), dataset, filter_state)]
+timer.lap("筛选")
+timer.info['filter'] = filter_state._asdict()
+timer.info['rows'] = len(filtered_df)
 
 # ========== 显示结果 ==========
 st.subheader(f"📅 第 {st.session_state.current_week} 周课程日历视图")
 if len(filtered_df) > 0:
-    st.markdown(render_timetable(filtered_df), unsafe_allow_html=True)
+    st.markdown(render_timetable_cached(dataset.version, filter_state, filtered_df), unsafe_allow_html=True)
 else:
     st.info("该周暂无课程安排")
+timer.lap("课表渲染")
 
 st.subheader(f"✅ 共找到 {len(filtered_df)} 条课程记录")
 
-display_cols = ["序号", "课程代码", "课程名称", "周次", "星期", "节次", "授课教师", "上课地点", "教学班", "备注"]
-available_cols = [col for col in display_cols if col in filtered_df.columns]
+available_cols = [col for col in DISPLAY_COLUMNS if col in filtered_df.columns]
 result_df = filtered_df[available_cols]
 
-st.dataframe(result_df, use_container_width=True, hide_index=True)
\ No newline at end of file
+st.dataframe(result_df, use_container_width=True, hide_index=True)
+timer.lap("结果表格")
+
+finish_rerun(timer)
@@ -0,0 +1,169 @@
+"""
+爬虫吞吐量测试
+
+在本机启动模拟教务系统（fake_eams.py），在临时目录中用指定的并发和速率完整运行一次爬虫，然后统计：
+- 课表页吞吐量（页/秒）：成功返回的课表页数 ÷ 从第一个到最后一个课表页请求的时间
+- 课表页请求耗时 p50 / p99（服务端从收到请求到发完响应，含模拟延迟）
+- 重试次数（课表页请求数 - 教师数）和各状态码的次数
+- 输出是否完整：未抓到的教师数，lessons_list.csv 的行数与模拟数据是否一致
+- 爬虫自己记录的指标（crawl_metrics.jsonl 的汇总记录）：客户端测得的请求耗时、各阶段耗时和瓶颈判断
+
+用法：python crawl_benchmark.py [--teachers 300] [--workers 8] [--rate 100] [--latency 0.05] [--error-rate 0.02]
+                               [--throttle-rate 0.02] [--json 结果.json]
+调整爬虫的并发或速率控制后，用同样的参数对比前后的结果即可发现吞吐量退化。
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from fake_eams import FakeEAMSConfig, FakeEAMSServer, teacher_lessons
+
+CRAWLER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'init-csv-database.py')
+BENCHMARK_COOKIE = 'JSESSIONID=benchmark'
+
+
+def count_csv_rows(path):
+    try:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            return max(0, sum(1 for _ in csv.reader(f)) - 1)
+    except FileNotFoundError:
+        return 0
+
+
+def read_crawler_summary(path):
+    """爬虫指标文件（crawl_metrics.jsonl）中最后的汇总记录，含客户端测得的请求耗时和瓶颈判断"""
+    summary = None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get('event') == 'summary':
+                    summary = record
+    except FileNotFoundError:
+        pass
+    return summary
+
+
+def summarize_records(records, config):
+    """由模拟服务器的请求记录统计吞吐量、耗时分位数、重试和完整性"""
+    schedule = [r for r in records if r.kind == 'schedule']
+    succeeded = {r.teacher_id for r in schedule if r.status == 200}
+    durations = np.array([r.duration for r in schedule]) * 1000
+    if schedule:
+        window = max(r.start + r.duration for r in schedule) - min(r.start for r in schedule)
+    else:
+        window = 0.0
+
+    return {
+        'teacher_list_requests': sum(1 for r in records if r.kind == 'list'),
+        'schedule_requests': len(schedule),
+        'schedule_pages': len(succeeded),
+        'crawl_window_seconds': round(window, 3),
+        'pages_per_second': round(len(succeeded) / window, 2) if window > 0 else 0.0,
+        'latency_p50_ms': round(float(np.percentile(durations, 50)), 1) if len(durations) else 0.0,
+        'latency_p99_ms': round(float(np.percentile(durations, 99)), 1) if len(durations) else 0.0,
+        'retries': len(schedule) - len({r.teacher_id for r in schedule}),
+        'status_counts': {str(status): n for status, n in sorted(Counter(r.status for r in records).items())},
+        'bytes_received': sum(r.bytes for r in records),
+        'missing_teachers': config.teachers - len(succeeded),
+    }
+
+
+def run_benchmark(config, workers, rate, keep_dir=None):
+    """启动模拟服务器并运行一次爬虫，返回统计结果字典"""
+    server = FakeEAMSServer(('127.0.0.1', 0), config)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    work_dir = keep_dir or tempfile.mkdtemp(prefix='crawl_benchmark_')
+    os.makedirs(work_dir, exist_ok=True)
+    command = [
+        sys.executable, CRAWLER_SCRIPT, '--no-cache',
+        '--base-url', server.base_url, '--cookie', BENCHMARK_COOKIE,
+        '--workers', str(workers), '--rate', str(rate),
+    ]
+    started = time.monotonic()
+    try:
+        with open(os.path.join(work_dir, 'crawler_output.txt'), 'w', encoding='utf-8') as output:
+            exit_code = subprocess.call(command, cwd=work_dir, stdout=output, stderr=subprocess.STDOUT)
+    finally:
+        server.shutdown()
+        server.server_close()
+    elapsed = time.monotonic() - started
+
+    result = {
+        'config': config._asdict(),
+        'workers': workers,
+        'rate': rate,
+        'exit_code': exit_code,
+        'total_seconds': round(elapsed, 3),
+    }
+    result.update(summarize_records(server.records, config))
+    result['lesson_rows'] = count_csv_rows(os.path.join(work_dir, 'lessons_list.csv'))
+    result['expected_lesson_rows'] = sum(len(teacher_lessons(config, i)) for i in range(1, config.teachers + 1))
+    result['crawler_summary'] = read_crawler_summary(os.path.join(work_dir, 'crawl_metrics.jsonl'))
+    result['work_dir'] = work_dir
+    return result
+
+
+def print_report(result):
+    print(f"教师 {result['config']['teachers']} 位 | 并发 {result['workers']} | 速率上限 {result['rate']:g} 次/秒 | "
+          f"延迟 {result['config']['latency'] * 1000:.0f}ms | 500 概率 {result['config']['error_rate']:.0%} | "
+          f"429 概率 {result['config']['throttle_rate']:.0%}")
+    print(f"  爬虫退出码          {result['exit_code']}（总耗时 {result['total_seconds']:.1f} 秒，含教师列表和后处理）")
+    print(f"  课表页吞吐量        {result['pages_per_second']:.1f} 页/秒（{result['schedule_pages']} 页，{result['crawl_window_seconds']:.1f} 秒）")
+    print(f"  请求耗时 p50 / p99  {result['latency_p50_ms']:.1f} / {result['latency_p99_ms']:.1f} ms")
+    print(f"  重试次数            {result['retries']}（课表页请求 {result['schedule_requests']} 次，教师列表请求 {result['teacher_list_requests']} 次）")
+    print(f"  状态码              {', '.join(f'{status}: {n}' for status, n in result['status_counts'].items())}")
+    print(f"  未抓到的教师        {result['missing_teachers']}")
+    print(f"  课程行              {result['lesson_rows']} / {result['expected_lesson_rows']}")
+    summary = result['crawler_summary']
+    if summary:
+        stages = ', '.join(f'{stage} {seconds:.1f}s' for stage, seconds in summary['stage_seconds'].items())
+        print(f"  爬虫自测            请求耗时均值 {summary['request_latency_mean_ms']:.1f} ms，瓶颈 {summary['bottleneck']}（{stages}）")
+    print(f"  输出目录            {result['work_dir']}")
+
+
+def main():
+    defaults = FakeEAMSConfig()
+    parser = argparse.ArgumentParser(description='在本地模拟教务系统上测试爬虫吞吐量')
+    parser.add_argument('--teachers', type=int, default=300, help='教师数（默认 300）')
+    parser.add_argument('--workers', type=int, default=8, help='爬虫并发线程数（默认 8）')
+    parser.add_argument('--rate', type=float, default=100, help='爬虫请求速率上限，次/秒（默认 100）')
+    parser.add_argument('--latency', type=float, default=defaults.latency, help='模拟的基础延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=defaults.jitter, help='模拟的额外随机延迟上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回 500 的概率')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='返回 429 的概率')
+    parser.add_argument('--max-page-size', type=int, default=defaults.max_page_size, help='教师列表每页最多返回的教师数')
+    parser.add_argument('--seed', type=int, default=defaults.seed, help='随机种子')
+    parser.add_argument('--keep-dir', help='爬虫的工作目录，默认使用新建的临时目录')
+    parser.add_argument('--json', help='把统计结果写入该 JSON 文件')
+    args = parser.parse_args()
+
+    config = defaults._replace(
+        teachers=args.teachers, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate, retry_after=0, max_page_size=args.max_page_size,
+        cookie=BENCHMARK_COOKIE, seed=args.seed,
+    )
+    result = run_benchmark(config, args.workers, args.rate, args.keep_dir)
+    print_report(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    incomplete = result['exit_code'] != 0 or result['missing_teachers'] or result['lesson_rows'] != result['expected_lesson_rows']
+    sys.exit(1 if incomplete else 0)
+
+
+if __name__ == '__main__':
+    main()
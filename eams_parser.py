@@ -0,0 +1,268 @@
+"""
+树维教务系统页面解析
+
+教师列表页和教师课表页都通过这里解析，支持两种后端：
+- lxml：C 实现的 HTML 解析器，直接在 lxml 树上定位需要的元素，速度最快
+- html.parser：Python 标准库解析器，配合 SoupStrainer 只构建 <span> 和 <table>，作为未安装 lxml 时的备用方案
+
+两种后端的提取结果一致，可运行 `python eams_parser.py 页面1.html 页面2.html ...` 对比实际页面；
+test_eams_parser.py 用模拟页面和边界情况检查两种后端都与原先整页 BeautifulSoup 解析的结果相同。
+"""
+import sys
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml.html
+    from lxml.etree import ParserError
+except ImportError:
+    lxml = None
+
+COURSE_COLUMNS = 17  # 已排课表格的列数
+SCHEDULED_LABEL = '已排课'
+DEFAULT_BACKEND = 'lxml' if lxml is not None else 'html.parser'
+BACKENDS = ('lxml', 'html.parser')
+
+# get_text 不会提取这些标签中的文字
+_SKIP_TEXT_TAGS = {'script', 'style', 'template'}
+
+
+def _resolve_backend(backend):
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的 HTML 解析后端: {backend}，可选值: {', '.join(BACKENDS)}")
+    if backend == 'lxml' and lxml is None:
+        raise ImportError("未安装 lxml，请先运行 pip install lxml 或改用 html.parser 后端")
+    return backend
+
+
+def _pad_row(row_data):
+    """补齐/截断为 COURSE_COLUMNS 列，空单元格记为 "null" """
+    row_data = [text if text else "null" for text in row_data]
+    while len(row_data) < COURSE_COLUMNS:
+        row_data.append("null")
+    return row_data[:COURSE_COLUMNS]
+
+
+# ===========================================
+# lxml 后端
+# ===========================================
+def _lxml_document(html):
+    if not html or not html.strip():
+        return None
+    try:
+        return lxml.html.fromstring(html.encode('utf-8'), parser=lxml.html.HTMLParser(encoding='utf-8'))
+    except ParserError:
+        return None
+
+
+def _lxml_text(el):
+    """与 BeautifulSoup 的 get_text(strip=True) 一致：各段文字去除首尾空白后直接拼接"""
+    parts = []
+
+    def walk(node):
+        if node.text and node.tag not in _SKIP_TEXT_TAGS:
+            parts.append(node.text)
+        for child in node:
+            # 注释节点的 tag 不是字符串，跳过其内容但保留其后的文字
+            if isinstance(child.tag, str):
+                walk(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(el)
+    return ''.join(part.strip() for part in parts)
+
+
+def _lxml_string(el):
+    """对应 BeautifulSoup 的 tag.string：标签内只有一段文字（可以包在唯一的子标签里）时返回该文字，否则返回 None"""
+    while True:
+        children = list(el)
+        if not children:
+            return el.text
+        only_child = children[0]
+        if len(children) > 1 or el.text or only_child.tail or not isinstance(only_child.tag, str):
+            return None
+        el = only_child
+
+
+def _lxml_course_rows(html):
+    doc = _lxml_document(html)
+    if doc is None:
+        return []
+
+    # 对应 soup.find('span', string='已排课')
+    scheduled_span = None
+    for span in doc.iter('span'):
+        if _lxml_string(span) == SCHEDULED_LABEL:
+            scheduled_span = span
+            break
+    if scheduled_span is None:
+        return []
+
+    following_tables = scheduled_span.xpath('following::table[1]')
+    if not following_tables:
+        return []
+
+    course_rows = []
+    for tr in list(following_tables[0].iter('tr'))[1:]:
+        if tr.xpath('.//td[@colspan]'):
+            continue
+        cells = list(tr.iter('td', 'th'))
+        if not cells:
+            continue
+        course_rows.append(_pad_row([_lxml_text(cell) for cell in cells]))
+    return course_rows
+
+
+def _lxml_teacher_list(html, base_url):
+    doc = _lxml_document(html)
+    if doc is None:
+        return []
+
+    teachers = []
+    all_tds = td_positions = None
+    for a in doc.iter('a'):
+        relative_link = a.get('href')
+        if relative_link is None:
+            continue
+
+        gender = "空"
+        department = "空"
+
+        td_name = next(a.iterancestors('td'), None)
+        if td_name is not None:
+            row = next(td_name.iterancestors('tr'), None)
+            if row is not None:
+                tds = list(row.iter('td'))
+                # 假设结构：[0:空] | [1:姓名] | [2:性别] | [3:院系]
+                if len(tds) > 2:
+                    gender = _lxml_text(tds[2]) or "空"
+                if len(tds) > 3:
+                    department = _lxml_text(tds[3]) or "空"
+            else:
+                # 备用方案：通过全局 td 列表定位（适用于无 <tr> 的情况）
+                # 位置表只在第一次用到时建立一次，之后每次查找都是 O(1)
+                if td_positions is None:
+                    all_tds = list(doc.iter('td'))
+                    td_positions = {td: i for i, td in enumerate(all_tds)}
+                i = td_positions[td_name]
+                if i + 1 < len(all_tds):
+                    gender = _lxml_text(all_tds[i + 1]) or "null"
+                if i + 2 < len(all_tds):
+                    department = _lxml_text(all_tds[i + 2]) or "null"
+
+        teachers.append({
+            '序号': len(teachers) + 1,
+            '姓名': _lxml_text(a),
+            '性别': gender,
+            '院系': department,
+            '链接': base_url + relative_link
+        })
+    return teachers
+
+
+# ===========================================
+# html.parser 后端
+# ===========================================
+def _soup_course_rows(html):
+    # 课程行只会出现在 span 之后的 table 中，其余标签无需建树
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer(['span', 'table']))
+    scheduled_span = soup.find('span', string=SCHEDULED_LABEL)
+
+    course_rows = []
+    if scheduled_span:
+        scheduled_table = scheduled_span.find_next('table')
+        if scheduled_table:
+            data_trs = scheduled_table.find_all('tr')[1:]
+            for tr in data_trs:
+                if tr.find('td', colspan=True):
+                    continue
+                tds = tr.find_all(['td', 'th'])
+                if not tds:
+                    continue
+                course_rows.append(_pad_row([td.get_text(strip=True) for td in tds]))
+    return course_rows
+
+
+def _soup_teacher_list(html, base_url):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    teachers = []
+    all_tds = td_positions = None
+    for idx, a in enumerate(soup.find_all('a', href=True), start=1):
+        gender = "空"
+        department = "空"
+
+        td_name = a.find_parent('td')
+        if td_name:
+            row = td_name.find_parent('tr')
+            if row:
+                tds = row.find_all('td')
+                # 假设结构：[0:空] | [1:姓名] | [2:性别] | [3:院系]
+                if len(tds) > 2:
+                    gender = tds[2].get_text(strip=True) or "空"
+                if len(tds) > 3:
+                    department = tds[3].get_text(strip=True) or "空"
+            else:
+                # 备用方案：通过全局 td 列表定位（适用于无 <tr> 的情况）
+                # 位置表只在第一次用到时建立一次，之后每次查找都是 O(1)；
+                # Tag 按内容判断相等，用 id 才能区分内容相同的单元格
+                if td_positions is None:
+                    all_tds = soup.find_all('td')
+                    td_positions = {id(td): i for i, td in enumerate(all_tds)}
+                i = td_positions[id(td_name)]
+                if i + 1 < len(all_tds):
+                    gender = all_tds[i + 1].get_text(strip=True) or "null"
+                if i + 2 < len(all_tds):
+                    department = all_tds[i + 2].get_text(strip=True) or "null"
+
+        teachers.append({
+            '序号': idx,
+            '姓名': a.get_text(strip=True),
+            '性别': gender,
+            '院系': department,
+            '链接': base_url + a['href']
+        })
+    return teachers
+
+
+# ===========================================
+# 对外接口
+# ===========================================
+def parse_course_rows(html, backend=None):
+    """从教师课表页中提取“已排课”表格的数据行，每行补齐/截断为 17 列"""
+    if _resolve_backend(backend) == 'lxml':
+        return _lxml_course_rows(html)
+    return _soup_course_rows(html)
+
+
+def parse_teacher_list(html, base_url, backend=None):
+    """从教师公共课表列表页中提取教师信息，返回 {序号, 姓名, 性别, 院系, 链接} 字典列表"""
+    if _resolve_backend(backend) == 'lxml':
+        return _lxml_teacher_list(html, base_url)
+    return _soup_teacher_list(html, base_url)
+
+
+# ===========================================
+# 对比两种后端的解析结果
+# ===========================================
+if __name__ == '__main__':
+    if lxml is None:
+        sys.exit("未安装 lxml，无法对比两种解析后端")
+    if len(sys.argv) < 2:
+        sys.exit("用法: python eams_parser.py 页面1.html [页面2.html ...]")
+
+    mismatched = 0
+    for path in sys.argv[1:]:
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        for name, parse in (('课程', parse_course_rows), ('教师', lambda h, backend: parse_teacher_list(h, '', backend))):
+            expected = parse(html, backend='html.parser')
+            actual = parse(html, backend='lxml')
+            if expected != actual:
+                mismatched += 1
+                print(f"❌ {path}：{name}解析结果不一致（html.parser {len(expected)} 行，lxml {len(actual)} 行）")
+        print(f"✅ {path} 检查完毕")
+
+    sys.exit(1 if mismatched else 0)
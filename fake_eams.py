@@ -0,0 +1,297 @@
+"""
+本地模拟教务系统
+
+在本机提供与树维教务系统相同接口的合成数据，用于在不访问真实教务系统的情况下测试爬虫、调整并发和速率：
+- POST /eams/studentPublicScheduleQuery!search.action   教师列表，支持 pageNo / pageSize 分页
+- GET  /eams/studentPublicScheduleQuery!courseTable.action?teacher.id=N   教师课表页（含“未排课”“已排课”两个表格）
+可以模拟响应延迟、5xx 错误、429 限流，以及服务器允许的最大分页大小；指定 --cookie 时，
+Cookie 中不含该值的请求会被重定向到登录页。同样的参数（含 --seed）每次生成的数据相同。
+
+用法：python fake_eams.py [--port 8765] [--teachers 2000] [--latency 0.05] [--error-rate 0.01] [--throttle-rate 0.02]
+然后：python init-csv-database.py --base-url http://127.0.0.1:8765 --no-cache
+"""
+import argparse
+import random
+import threading
+import time
+from collections import namedtuple
+from html import escape
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+SEARCH_PATH = '/eams/studentPublicScheduleQuery!search.action'
+COURSE_TABLE_PATH = '/eams/studentPublicScheduleQuery!courseTable.action'
+LOGIN_PATH = '/eams/login.action'
+
+# teachers: 教师数；max_lessons: 每位教师最多的已排课行数；
+# latency / jitter: 每个请求的基础延迟和额外随机延迟（秒）；error_rate / throttle_rate: 返回 500 / 429 的概率；
+# retry_after: 429 响应的 Retry-After（秒）；max_page_size: 教师列表每页最多返回的教师数；
+# cookie: 非空时要求请求的 Cookie 中包含该值；seed: 合成数据和故障注入的随机种子
+FakeEAMSConfig = namedtuple(
+    'FakeEAMSConfig',
+    ['teachers', 'max_lessons', 'latency', 'jitter', 'error_rate', 'throttle_rate', 'retry_after',
+     'max_page_size', 'cookie', 'seed'],
+    defaults=[2000, 6, 0.05, 0.02, 0.0, 0.0, 1, 1000, '', 0],
+)
+
+# 一次请求的记录：kind 为 'list'（教师列表）或 'schedule'（教师课表），start 为 time.monotonic()，duration 含模拟延迟
+RequestRecord = namedtuple('RequestRecord', ['kind', 'teacher_id', 'status', 'start', 'duration', 'bytes'])
+
+
+# ===========================================
+# 合成数据
+# ===========================================
+CAMPUS_BUILDINGS = ['文管', '信息', '综合', '建筑', '理学', '工程', '外语', '艺术']
+COURSE_SUBJECTS = ['高等数学', '大学物理', '线性代数', '程序设计', '大学英语', '概率统计', '数据结构', '电路分析',
+                   '有机化学', '工程制图', '经济学原理', '管理学', '中国近现代史纲要', '体育', '机械设计', '操作系统']
+COURSE_LEVELS = ['', 'A', 'B', '（上）', '（下）', '实验']
+COURSE_CATEGORIES = ['必修', '选修', '通识', '实践']
+DEPARTMENTS = ['数学学院', '物理学院', '计算机学院', '外国语学院', '经济管理学院', '建筑学院', '化学学院', '机械学院']
+WEEKDAY_NAMES = ['星期日', '星期一', '星期二', '星期三', '星期四', '星期五', '星期六']
+COURSE_HEADERS = ['序号', '课程序号', '课程代码', '课程名称', '课程类别', '教学班', '周课时', '学分', '授课语言',
+                  '上课人数', '是否排课', '周次', '星期', '节次', '授课教师', '上课地点', '备注']
+
+
+def teacher_name(teacher_id):
+    return f'教师{teacher_id:05d}'
+
+
+def _room(rng):
+    building = rng.choice(CAMPUS_BUILDINGS)
+    return f"{building}{'ABCD'[rng.randrange(4)]}{rng.randint(1, 6)}{rng.randint(1, 20):02d}"
+
+
+def _weeks(rng):
+    start = rng.randint(1, 8)
+    end = min(20, start + rng.randint(3, 15))
+    kind = rng.random()
+    if kind < 0.6:
+        return f'[{start}-{end}]'
+    if kind < 0.75:
+        return f'[{start}-{end}]单'
+    if kind < 0.9:
+        return f'[{start}-{end}]双'
+    return f'[{start}-{end}],{min(20, end + 2)}'
+
+
+def teacher_lessons(config, teacher_id):
+    """第 teacher_id 位教师的已排课行（17 列），由 seed 和 teacher_id 唯一确定"""
+    rng = random.Random(config.seed * 1_000_003 + teacher_id)
+    rows = []
+    for k in range(rng.randint(0, config.max_lessons)):
+        course_no = rng.randrange(len(COURSE_SUBJECTS) * len(COURSE_LEVELS))
+        subject, level = divmod(course_no, len(COURSE_LEVELS))
+        start_period = rng.randint(1, 11)
+        if rng.random() < 0.15:
+            location = ','.join(_room(rng) for _ in range(2))
+        else:
+            location = _room(rng) + ('*' if rng.random() < 0.05 else '')
+        rows.append([
+            str(k + 1),
+            f'{teacher_id:05d}{k:02d}',
+            f'C{course_no:04d}',
+            COURSE_SUBJECTS[subject] + COURSE_LEVELS[level],
+            rng.choice(COURSE_CATEGORIES),
+            f'{rng.choice(DEPARTMENTS)}{rng.randint(1, 40)}班',
+            str(rng.choice([2, 3, 4])),
+            str(rng.choice([1, 2, 3, 4])),
+            '中文',
+            str(rng.randint(20, 180)),
+            '是',
+            _weeks(rng),
+            rng.choice(WEEKDAY_NAMES),
+            f'[{start_period}-{start_period + 1}]',
+            teacher_name(teacher_id),
+            location,
+            '' if rng.random() < 0.8 else '单双周交替',
+        ])
+    return rows
+
+
+def _table(headers, rows):
+    parts = ['<table class="gridtable"><tr>']
+    parts.extend(f'<th>{escape(h)}</th>' for h in headers)
+    parts.append('</tr>')
+    for row in rows:
+        parts.append('<tr>' + ''.join(f'<td>{escape(cell)}</td>' for cell in row) + '</tr>')
+    parts.append('</table>')
+    return ''.join(parts)
+
+
+def course_table_page(config, teacher_id):
+    lessons = teacher_lessons(config, teacher_id)
+    return (
+        '<html><body>'
+        '<span>未排课</span>' + _table(COURSE_HEADERS[:5], []) +
+        '<span>已排课</span>' + _table(COURSE_HEADERS, lessons) +
+        '</body></html>'
+    )
+
+
+def teacher_list_page(config, page_no, page_size):
+    first = (page_no - 1) * page_size + 1
+    last = min(config.teachers, page_no * page_size)
+    rows = []
+    for teacher_id in range(first, last + 1):
+        gender = ('男', '女', '')[teacher_id % 3]
+        department = DEPARTMENTS[teacher_id % len(DEPARTMENTS)]
+        rows.append(
+            f'<tr><td><input type="checkbox"/></td>'
+            f'<td><a href="{COURSE_TABLE_PATH}?teacher.id={teacher_id}">{teacher_name(teacher_id)}</a></td>'
+            f'<td>{gender}</td><td>{department}</td></tr>'
+        )
+    return '<table class="gridtable"><tr><th></th><th>姓名</th><th>性别</th><th>院系</th></tr>' + ''.join(rows) + '</table>'
+
+
+# ===========================================
+# HTTP 服务
+# ===========================================
+class FakeEAMSServer(ThreadingHTTPServer):
+    """每个请求一个线程；所有请求记录在 records 中，供压测程序统计"""
+
+    daemon_threads = True
+
+    def __init__(self, address, config=FakeEAMSConfig()):
+        super().__init__(address, FakeEAMSHandler)
+        self.config = config
+        self.records = []
+        self._lock = threading.Lock()
+        self._fault_rng = random.Random(config.seed)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def draw_fault(self):
+        """按 throttle_rate / error_rate 抽取本次请求要模拟的故障，返回 429、500 或 None"""
+        with self._lock:
+            r = self._fault_rng.random()
+        if r < self.config.throttle_rate:
+            return HTTPStatus.TOO_MANY_REQUESTS
+        if r < self.config.throttle_rate + self.config.error_rate:
+            return HTTPStatus.INTERNAL_SERVER_ERROR
+        return None
+
+    def delay(self):
+        with self._lock:
+            jitter = self._fault_rng.uniform(0, self.config.jitter)
+        time.sleep(self.config.latency + jitter)
+
+    def record(self, record):
+        with self._lock:
+            self.records.append(record)
+
+
+class FakeEAMSHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeEAMS/1.0'
+    protocol_version = 'HTTP/1.1'  # 支持 keep-alive，与真实服务器一样复用连接
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == LOGIN_PATH:
+            self._send(HTTPStatus.OK, '<html><body>请登录</body></html>')
+        elif url.path == SEARCH_PATH:
+            self._send(HTTPStatus.OK, '<html><body>教师公共课表查询</body></html>')
+        elif url.path == COURSE_TABLE_PATH:
+            try:
+                teacher_id = int(parse_qs(url.query)['teacher.id'][0])
+            except (KeyError, ValueError):
+                self._send(HTTPStatus.BAD_REQUEST, '缺少 teacher.id')
+                return
+            self._serve('schedule', teacher_id, lambda: course_table_page(self.server.config, teacher_id))
+        else:
+            self._send(HTTPStatus.NOT_FOUND, '')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        form = {name: values[-1] for name, values in parse_qs(self.rfile.read(length).decode('utf-8')).items()}
+        if urlsplit(self.path).path != SEARCH_PATH:
+            self._send(HTTPStatus.NOT_FOUND, '')
+            return
+        try:
+            page_no = max(1, int(form.get('pageNo', 1)))
+            page_size = min(max(1, int(form.get('pageSize', 20))), self.server.config.max_page_size)
+        except ValueError:
+            self._send(HTTPStatus.BAD_REQUEST, 'pageNo / pageSize 应为整数')
+            return
+        self._serve('list', None, lambda: teacher_list_page(self.server.config, page_no, page_size))
+
+    def _serve(self, kind, teacher_id, build):
+        """依次模拟登录检查、延迟和故障，然后返回 build() 生成的页面，并记录本次请求"""
+        server = self.server
+        start = time.monotonic()
+        cookie = server.config.cookie
+        if cookie and cookie not in self.headers.get('Cookie', ''):
+            status, nbytes = HTTPStatus.FOUND, self._redirect(LOGIN_PATH)
+        else:
+            server.delay()
+            status = server.draw_fault()
+            if status is None:
+                status = HTTPStatus.OK
+                nbytes = self._send(status, build())
+            else:
+                nbytes = self._send(status, '', {'Retry-After': str(server.config.retry_after)}
+                                    if status == HTTPStatus.TOO_MANY_REQUESTS else None)
+        server.record(RequestRecord(kind, teacher_id, int(status), start, time.monotonic() - start, nbytes))
+
+    def _send(self, status, html, headers=None):
+        body = html.encode('utf-8')
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'text/html;charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return len(body)
+
+    def _redirect(self, location):
+        self.send_response(HTTPStatus.FOUND)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+        return 0
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    defaults = FakeEAMSConfig()
+    parser = argparse.ArgumentParser(description='本地模拟教务系统')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址（默认 {DEFAULT_HOST}）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'监听端口（默认 {DEFAULT_PORT}）')
+    parser.add_argument('--teachers', type=int, default=defaults.teachers, help='教师数')
+    parser.add_argument('--max-lessons', type=int, default=defaults.max_lessons, help='每位教师最多的已排课行数')
+    parser.add_argument('--latency', type=float, default=defaults.latency, help='每个请求的基础延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=defaults.jitter, help='额外随机延迟的上限（秒）')
+    parser.add_argument('--error-rate', type=float, default=defaults.error_rate, help='返回 500 的概率')
+    parser.add_argument('--throttle-rate', type=float, default=defaults.throttle_rate, help='返回 429 的概率')
+    parser.add_argument('--retry-after', type=int, default=defaults.retry_after, help='429 响应的 Retry-After（秒）')
+    parser.add_argument('--max-page-size', type=int, default=defaults.max_page_size, help='教师列表每页最多返回的教师数')
+    parser.add_argument('--cookie', default=defaults.cookie, help='要求请求的 Cookie 中包含的值，为空则不检查')
+    parser.add_argument('--seed', type=int, default=defaults.seed, help='随机种子')
+    args = parser.parse_args()
+
+    config = FakeEAMSConfig(
+        args.teachers, args.max_lessons, args.latency, args.jitter, args.error_rate, args.throttle_rate,
+        args.retry_after, args.max_page_size, args.cookie, args.seed,
+    )
+    server = FakeEAMSServer((args.host, args.port), config)
+    print(f"模拟教务系统已启动: {server.base_url}（{config.teachers} 位教师）")
+    print(f"运行爬虫: python init-csv-database.py --base-url {server.base_url} --no-cache")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+数据文件热加载
+
+后台线程定期检查一组文件的 (修改时间, 大小)。文件变化后，在后台线程中重新构建数据，
+构建完成后一次性替换 current；请求线程只读取 current，不会看到加载到一半的数据，也不必等待加载。
+"""
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def file_version(paths):
+    """各文件的 (修改时间, 大小)，文件不存在时为 None"""
+    version = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            version.append(None)
+            continue
+        version.append((stat.st_mtime_ns, stat.st_size))
+    return tuple(version)
+
+
+class HotReloader:
+    """
+    load(version) 根据当前文件构建数据，返回的对象整体作为 current 对外提供
+    文件发生变化后，要在相邻两次检查中保持不变（已写完）才会重新加载；加载失败时继续使用旧数据
+    """
+
+    def __init__(self, paths, load, interval=5.0):
+        self.paths = list(paths)
+        self.load = load
+        self.interval = interval
+        self.current = None
+        self.version = None
+        self.reloads = 0
+        self.last_error = None
+        self._pending_version = None  # 已发现变化、等待确认写完的版本
+        self._failed_version = None  # 加载失败的版本，文件再次变化前不重试
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """在调用线程中完成首次加载（失败时直接抛出异常），然后启动后台检查线程"""
+        version = file_version(self.paths)
+        self.current = self.load(version)
+        self.version = version
+        self._thread = threading.Thread(target=self._run, name='hot-reload', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """检查一次文件版本，重新加载了数据时返回 True"""
+        version = file_version(self.paths)
+        if version == self.version or version == self._failed_version:
+            self._pending_version = None
+            return False
+        if version != self._pending_version:
+            self._pending_version = version
+            return False
+
+        self._pending_version = None
+        try:
+            data = self.load(version)
+        except Exception as e:
+            self._failed_version = version
+            self.last_error = e
+            logger.exception("重新加载数据失败，继续使用旧数据: %s", e)
+            return False
+
+        # 单次赋值替换，读取方拿到的要么是旧数据，要么是完整的新数据
+        self.current = data
+        self.version = version
+        self._failed_version = None
+        self.reloads += 1
+        logger.info("数据文件已更新，完成第 %d 次重新加载", self.reloads)
+        return True
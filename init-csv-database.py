@@ -1,9 +1,26 @@
+import argparse
 import csv
-from bs4 import BeautifulSoup
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
 import requests
 import time
 import pandas as pd
 
+from eams_parser import parse_course_rows, parse_teacher_list
+from lesson_conflicts import find_conflicts, summarize_conflicts, write_conflict_report
+from lesson_schedule import compile_lessons, feather, split_classrooms, write_compiled_lessons
+
 # ===== 手动配置项 =====
 
 BASE_URL = 'http://example.com'  # 教务系统域名，此处不加/eams后缀
@@ -17,321 +34,1064 @@ EAMS_UNDERLINE = 'xxx' # 下述post请求中的_参数值
 TEACHER_LIST_OUTPUT_CSV = 'teacher_list.csv'
 LESSONS_LIST_OUTPUT_CSV = 'lessons_list.csv'
 LESSONS_DEDUP_LIST_OUTPUT_CSV = 'lessons_list_dedup.csv'
+LESSONS_COMPILED_OUTPUT = 'lessons_list_dedup.feather'  # 供检索网页直接加载的预编译课程文件（需要 pyarrow）
+LESSONS_CONFLICT_REPORT_CSV = 'lesson_conflicts.csv'  # 排课冲突报告
 CLASSROOM_LIST_OUTPUT_TXT = 'classroom_list.txt'
 LOG_FILE = 'process.log'
+CHECKPOINT_FILE = 'crawl_checkpoint.jsonl'  # 断点日志，记录已完成的教师，用于 --resume 续抓
+TEACHER_PAGE_SIZE = 500  # 教师列表每页的教师数，各页分别请求、逐页解析
+TEACHER_LIST_WORKERS = 4  # 同时请求的教师列表页数
+CRAWL_WORKERS = 8  # 并发抓取教师课表的线程数，设为 1 即为顺序抓取
+REQUEST_RATE = 10  # 所有线程共享的请求速率上限（次/秒），防止请求过快
+REQUEST_BURST = 5  # 空闲后允许连续发出的请求数
+MAX_RETRIES = 5  # 单个教师的最大重试次数，仍失败则跳过该教师（可用 --resume 补抓）
+BACKOFF_BASE = 1  # 重试等待的初始时间（秒），之后每次翻倍并加入随机抖动
+BACKOFF_MAX = 60  # 重试等待时间的上限（秒）
+PAGE_CACHE_DIR = 'page_cache'  # 教师课表页缓存目录，用于增量重抓；设为 None 则不使用缓存
+HTML_PARSER_BACKEND = None  # 页面解析后端：'lxml' 或 'html.parser'，None 表示已安装 lxml 时自动使用 lxml
+PARSE_WORKERS = None  # 解析课表页的进程数，None 表示使用全部 CPU 核心，0 表示直接在抓取线程中解析
+PIPELINE_DEPTH = 64  # 已提交但尚未写出的教师数上限，用于限制抓取超前于写出时的内存占用
+WRITE_BATCH_SIZE = 20  # 每累积多少位教师的课程行统一写入、落盘并更新一次断点日志
+METRICS_FILE = 'crawl_metrics.jsonl'  # 抓取指标（JSON Lines）：每位教师一条记录，并定期追加进度记录
+METRICS_INTERVAL = 10  # 进度记录的间隔（秒）
+STALL_ALERT_SECONDS = 120  # 超过这么多秒没有教师完成抓取时告警
+PROMETHEUS_FILE = None  # 同时以 Prometheus 文本格式写出指标的文件（可供 node_exporter 的 textfile 采集），None 表示不写
+
+
+# ===== 命令行参数 =====
+parser = argparse.ArgumentParser(description='抓取树维教务系统的教师课表并生成课程数据文件')
+parser.add_argument('--resume', action='store_true', help='根据断点日志续抓，跳过已完成的教师')
+parser.add_argument('--no-cache', action='store_true', help='忽略教师课表页缓存，全部重新下载解析')
+# 以下参数用于指向其他服务器（如本地模拟服务器 fake_eams.py）或调整并发，未指定时依次使用环境变量、上面的配置项
+parser.add_argument('--base-url', default=os.environ.get('EAMS_BASE_URL', BASE_URL),
+                    help='教务系统域名，不加/eams后缀（环境变量 EAMS_BASE_URL）')
+parser.add_argument('--cookie', default=os.environ.get('EAMS_COOKIE', EAMS_COOKIE),
+                    help='教务系统登录后的 Cookie 值（环境变量 EAMS_COOKIE）')
+parser.add_argument('--workers', type=int, default=CRAWL_WORKERS, help=f'并发抓取线程数（默认 {CRAWL_WORKERS}）')
+parser.add_argument('--rate', type=float, default=REQUEST_RATE, help=f'全局请求速率上限，次/秒（默认 {REQUEST_RATE}）')
+parser.add_argument('--prometheus-file', default=PROMETHEUS_FILE, help='以 Prometheus 文本格式写出抓取指标的文件')
+args = parser.parse_args()
+
+BASE_URL = args.base_url.rstrip('/')
+EAMS_COOKIE = args.cookie
+CRAWL_WORKERS = args.workers
+REQUEST_RATE = args.rate
 
 
 # ===== 自定义 print + log 函数 =====
+# 各线程只把日志放入队列，由后台线程统一写控制台和日志文件，避免抓取线程等待 I/O
+_log_queue = queue.SimpleQueue()
+logger = logging.getLogger('eams_crawler')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+logger.addHandler(QueueHandler(_log_queue))
+
+
+def start_logging():
+    """启动后台日志线程，返回的 QueueListener 需在程序结束前 stop()，以写完队列中剩余的日志"""
+    console_handler = logging.StreamHandler(sys.stdout)
+    file_handler = logging.FileHandler(LOG_FILE, encoding='utf-8')  # 整个运行期间只打开一次
+    for handler in (console_handler, file_handler):
+        handler.terminator = ''  # log_print 构造的消息已包含 end
+    listener = QueueListener(_log_queue, console_handler, file_handler)
+    listener.start()
+    return listener
+
+
 def log_print(*args, **kwargs):
     """同时打印到控制台和日志文件"""
     # 构造要输出的字符串（模拟 print 的默认行为）
     sep = kwargs.get('sep', ' ')
     end = kwargs.get('end', '\n')
     message = sep.join(str(arg) for arg in args) + end
-
-    # 打印到控制台
-    print(message, end='')  # 注意：message 已包含 end
-
-    # 追加写入日志文件（使用 UTF-8）
-    with open(LOG_FILE, 'a', encoding='utf-8') as f:
-        f.write(message)
+    logger.info(message)
+
+
+# ===== 请求速率控制 =====
+class AuthError(Exception):
+    """Cookie 失效或被重定向到登录页，重试没有意义，需要立即停止抓取"""
+
+
+class RateController:
+    """
+    所有抓取线程共享的速率控制：
+    - 令牌桶限制全局请求速率（每秒 rate 个令牌，最多积攒 burst 个）
+    - 限制同时在途的请求数，遇到 429/503 时减半，连续成功 recover_after 次后加 1，直到恢复为 max_concurrency
+    """
+
+    def __init__(self, rate, burst, max_concurrency, recover_after=20):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.recover_after = recover_after
+        self.stopped = threading.Event()  # 出现认证错误后置位，通知所有线程停止
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._in_flight = 0
+        self._success_streak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """阻塞直到拿到并发名额和令牌"""
+        with self._cond:
+            while self._in_flight >= self.concurrency:
+                self._cond.wait()
+            self._in_flight += 1
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._cond.wait((1 - self._tokens) / self.rate)
+
+    def release(self, throttled=False):
+        """请求结束后归还并发名额，throttled 表示服务器返回了 429/503"""
+        with self._cond:
+            self._in_flight -= 1
+            if throttled:
+                self._success_streak = 0
+                self._tokens = 0  # 清空令牌，让所有线程一起放慢
+                if self.concurrency > 1:
+                    self.concurrency = max(1, self.concurrency // 2)
+                    log_print(f"⚠️ 服务器繁忙（429/503），并发数降至 {self.concurrency}")
+            else:
+                self._success_streak += 1
+                if self.concurrency < self.max_concurrency and self._success_streak >= self.recover_after:
+                    self._success_streak = 0
+                    self.concurrency += 1
+            self._cond.notify_all()
+
+
+def backoff_delay(attempt):
+    """第 attempt 次失败后的等待时间：按 2 的指数增长，并在后一半区间内随机抖动"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def parse_retry_after(value):
+    """解析 Retry-After 头（仅支持秒数形式），无法解析时返回 0"""
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def is_auth_failure(resp):
+    """判断响应是否说明登录状态已失效：401/403，或被重定向到了登录页"""
+    if resp.status_code in (401, 403):
+        return True
+    return bool(resp.history) and 'login' in resp.url.lower()
+
+
+rate_controller = RateController(REQUEST_RATE, REQUEST_BURST, CRAWL_WORKERS)
+
+
+# ===== 断点日志 =====
+class CrawlJournal:
+    """
+    记录已完成教师的断点日志，每行一条 JSON：{"url": 教师链接, "offset": 课程 CSV 长度}
+    offset 为该教师的课程行写入并落盘后 LESSONS_LIST_OUTPUT_CSV 的字节数，
+    续抓时据此截掉崩溃前写了一半、尚未记入日志的课程行
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def load(self):
+        """返回 (已完成的教师 URL 集合, 最后一条记录的 offset)，没有记录时 offset 为 None"""
+        done_urls = set()
+        offset = None
+        valid_size = 0
+        try:
+            with open(self.path, 'r+b') as f:
+                for line in f:
+                    # 末尾不完整的一行说明写入时崩溃，之后的内容均不可信
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        record = json.loads(line.decode('utf-8'))
+                    except ValueError:
+                        break
+                    done_urls.add(record['url'])
+                    offset = record['offset']
+                    valid_size += len(line)
+                # 丢弃损坏的尾部，保证之后追加的记录从新的一行开始
+                f.truncate(valid_size)
+        except FileNotFoundError:
+            pass
+        return done_urls, offset
+
+    def reset(self):
+        open(self.path, 'w', encoding='utf-8').close()
+
+    def record_many(self, records):
+        """追加一批 (url, offset) 记录并落盘"""
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(''.join(
+            json.dumps({'url': url, 'offset': offset}, ensure_ascii=False) + '\n' for url, offset in records
+        ))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# ===== 课程 CSV 写出 =====
+class LessonWriter:
+    """
+    在整个抓取期间持有课程 CSV 的唯一句柄，按教师累积课程行，
+    每 batch_size 位教师统一写入并 fsync，落盘之后才把这些教师记入断点日志
+    """
+
+    def __init__(self, path, journal, batch_size):
+        self.journal = journal
+        self.batch_size = batch_size
+        self._file = open(path, 'ab')
+        self._offset = self._file.seek(0, os.SEEK_END)
+        self._chunks = []
+        self._records = []
+
+    def write(self, url, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        data = buffer.getvalue().encode('utf-8')
+        self._chunks.append(data)
+        self._offset += len(data)
+        self._records.append((url, self._offset))
+        if len(self._records) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._records:
+            return
+        started = time.perf_counter()
+        self._file.write(b''.join(self._chunks))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.journal.record_many(self._records)
+        crawl_metrics.add_stage('write', time.perf_counter() - started)
+        self._chunks.clear()
+        self._records.clear()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self.journal.close()
+
+
+# ===== 教师课表页缓存 =====
+class PageCache:
+    """
+    按 (学期, 教师链接) 缓存课表页，每个页面一个 JSON 文件：
+    {"etag": ..., "last_modified": ..., "hash": 页面内容 SHA-256, "rows": 解析出的课程行}
+    用于条件请求（If-None-Match / If-Modified-Since），以及在页面内容未变化时跳过解析
+    """
+
+    def __init__(self, cache_dir, semester_id):
+        self.cache_dir = cache_dir
+        self.semester_id = semester_id
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        key = hashlib.sha1(f'{self.semester_id}|{url}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, url):
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def put(self, url, entry):
+        # 先写临时文件再替换，避免并发读取或中断时留下半个文件
+        path = self._path(url)
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+page_cache = None if args.no_cache or not PAGE_CACHE_DIR else PageCache(PAGE_CACHE_DIR, EAMS_SEMESTER_ID)
+
+
+# ===== 抓取指标 =====
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # 请求耗时直方图的分桶上界（秒）
+
+# 写出进程（主线程）的时间花在哪里，就说明瓶颈在哪里
+BOTTLENECK_STAGES = {'wait_fetch': 'server', 'wait_parse': 'parser', 'write': 'disk'}
+
+
+def new_fetch_stats():
+    """单个教师的抓取统计，由抓取线程填写，写出时交给 CrawlMetrics.record_teacher"""
+    return {
+        'status': 'failed',  # ok：下载并解析；not_modified：304；unchanged：内容与缓存相同；failed：放弃
+        'attempts': 0,
+        'fetch_seconds': 0.0,  # 所有请求的耗时之和
+        'rate_wait_seconds': 0.0,  # 等待速率控制放行的时间
+        'parse_seconds': None,
+        'bytes': 0,
+        'errors': [],  # 每次失败的错误类型，如 "HTTP 429"、"ReadTimeout"
+    }
+
+
+def error_class(error):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return f'HTTP {error.response.status_code}'
+    return type(error).__name__
+
+
+class CrawlMetrics:
+    """
+    抓取指标，线程安全：
+    - 每位教师写出后追加一条 {"event": "teacher", ...} 记录：请求耗时、解析耗时、下载字节数、课程行数、重试次数和错误类型
+    - 后台线程每 interval 秒追加一条 {"event": "progress", ...} 记录：吞吐量、预计剩余时间、各阶段累计耗时和瓶颈判断，
+      同时在控制台打印一行进度，并按需写出 Prometheus 文本格式文件
+    - 超过 stall_after 秒没有教师完成时记录 {"event": "stall", ...} 并告警
+    各阶段耗时：fetch / rate_wait 为抓取线程的请求和限速等待时间之和，parse 为解析时间之和；
+    wait_fetch / wait_parse / write 为写出进程等待抓取、等待解析和写盘的时间，三者中最大的即为瓶颈
+    """
+
+    def __init__(self, path, prometheus_path=None, interval=10, stall_after=120):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.stall_after = stall_after
+        self.teacher_total = None  # 教师列表的总人数，列表取完后才知道
+        self.resumed = 0  # 续抓时跳过的已完成教师数
+        self.teachers = Counter()  # 按 status 计数
+        self.requests = Counter()  # 按请求类型（list / schedule）计数
+        self.errors = Counter()
+        self.stage_seconds = Counter()
+        self.retries = 0
+        self.bytes = 0
+        self.rows = 0
+        self._latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self._latency_sum = 0.0
+        self._lock = threading.Lock()
+        self._file = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self._last_progress = None
+        self._stalled = False
+
+    def start(self, append=False):
+        self._file = open(self.path, 'a' if append else 'w', encoding='utf-8')
+        self._started = self._last_progress = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name='crawl-metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程，追加最终的汇总记录"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        self.report('summary')
+        self._file.close()
+
+    def _emit(self, record):
+        line = json.dumps(dict(record, time=round(time.time(), 3)), ensure_ascii=False) + '\n'
+        with self._lock:
+            self._file.write(line)
+
+    # ---------- 记录 ----------
+    def record_request(self, kind, seconds, nbytes=0, error=None):
+        """一次 HTTP 请求（含失败的请求）"""
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self._lock:
+            self.requests[kind] += 1
+            self.bytes += nbytes
+            self._latency_buckets[bucket] += 1
+            self._latency_sum += seconds
+            if error is not None:
+                self.errors[error] += 1
+
+    def add_stage(self, stage, seconds):
+        with self._lock:
+            self.stage_seconds[stage] += seconds
+
+    def record_teacher(self, row_idx, teacher_info, stats, rows):
+        """一位教师处理完毕（写出或放弃）"""
+        with self._lock:
+            self.teachers[stats['status']] += 1
+            self.retries += max(0, stats['attempts'] - 1)
+            self.rows += rows
+            self.stage_seconds['fetch'] += stats['fetch_seconds']
+            self.stage_seconds['rate_wait'] += stats['rate_wait_seconds']
+            if stats['parse_seconds'] is not None:
+                self.stage_seconds['parse'] += stats['parse_seconds']
+            self._last_progress = time.monotonic()
+        self._emit({
+            'event': 'teacher',
+            'row': row_idx,
+            'teacher': teacher_info,
+            'status': stats['status'],
+            'fetch_ms': round(stats['fetch_seconds'] * 1000, 1),
+            'rate_wait_ms': round(stats['rate_wait_seconds'] * 1000, 1),
+            'parse_ms': None if stats['parse_seconds'] is None else round(stats['parse_seconds'] * 1000, 1),
+            'bytes': stats['bytes'],
+            'rows': rows,
+            'retries': max(0, stats['attempts'] - 1),
+            'errors': stats['errors'],
+        })
+
+    # ---------- 汇总 ----------
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            elapsed = max(now - self._started, 1e-9)
+            finished = sum(self.teachers.values())
+            done = finished - self.teachers['failed']
+            rate = finished / elapsed
+            eta = None
+            if self.teacher_total is not None and rate > 0:
+                eta = max(0, self.teacher_total - self.resumed - finished) / rate
+
+            main_stages = {stage: self.stage_seconds[stage] for stage in BOTTLENECK_STAGES}
+            bottleneck = None
+            if any(main_stages.values()):
+                bottleneck = BOTTLENECK_STAGES[max(main_stages, key=main_stages.get)]
+                # 抓取线程等待限速的时间比请求本身还长，说明是自己的速率限制在拖慢抓取
+                if bottleneck == 'server' and self.stage_seconds['rate_wait'] > self.stage_seconds['fetch']:
+                    bottleneck = 'rate_limit'
+
+            return {
+                'elapsed_s': round(elapsed, 1),
+                'teachers_done': done,
+                'teachers_failed': self.teachers['failed'],
+                'teachers_resumed': self.resumed,
+                'teachers_total': self.teacher_total,
+                'teacher_status': dict(self.teachers),
+                'teachers_per_s': round(rate, 3),
+                'rows_per_s': round(self.rows / elapsed, 1),
+                'bytes_per_s': round(self.bytes / elapsed, 1),
+                'eta_s': None if eta is None else round(eta, 1),
+                'requests': dict(self.requests),
+                'retries': self.retries,
+                'errors': dict(self.errors),
+                'rows': self.rows,
+                'bytes': self.bytes,
+                'request_latency_mean_ms': round(self._latency_sum / max(1, sum(self.requests.values())) * 1000, 1),
+                'stage_seconds': {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+                'bottleneck': bottleneck,
+                'seconds_since_progress': round(now - self._last_progress, 1),
+            }
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.report('progress')
+
+    def report(self, event):
+        snapshot = self.snapshot()
+        self._check_stall(snapshot)
+        snapshot['stalled'] = self._stalled
+        self._emit(dict(snapshot, event=event))
+        with self._lock:
+            self._file.flush()
+        if self.prometheus_path:
+            self.write_prometheus(snapshot)
+
+        total = '?' if snapshot['teachers_total'] is None else snapshot['teachers_total'] - snapshot['teachers_resumed']
+        eta = '未知' if snapshot['eta_s'] is None else f"{snapshot['eta_s'] / 60:.1f} 分钟"
+        log_print(f"📊 进度: {snapshot['teachers_done'] + snapshot['teachers_failed']}/{total} 位教师，"
+                  f"{snapshot['teachers_per_s']:.2f} 位/秒，{snapshot['bytes_per_s'] / 1024:.0f} KB/秒，"
+                  f"重试 {snapshot['retries']} 次，预计剩余 {eta}，瓶颈: {snapshot['bottleneck'] or '未知'}")
+
+    def _check_stall(self, snapshot):
+        idle = snapshot['seconds_since_progress']
+        if idle >= self.stall_after and not self._stalled:
+            self._stalled = True
+            log_print(f"⚠️ 抓取停滞：已有 {idle:.0f} 秒没有教师完成，请检查网络、服务器状态或 Cookie")
+            self._emit({'event': 'stall', 'seconds_since_progress': idle})
+        elif idle < self.stall_after and self._stalled:
+            self._stalled = False
+            log_print("✅ 抓取已恢复")
+
+    def write_prometheus(self, snapshot):
+        """以 Prometheus 文本格式写出当前指标，先写临时文件再替换"""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{v}"' for k, v in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        metric('eams_crawl_teachers_total', 'counter', 'Teachers finished, by status.',
+               [({'status': status}, n) for status, n in snapshot['teacher_status'].items()])
+        if snapshot['teachers_total'] is not None:
+            metric('eams_crawl_teachers_expected', 'gauge', 'Teachers in the teacher list.',
+                   [({}, snapshot['teachers_total'])])
+        metric('eams_crawl_requests_total', 'counter', 'HTTP requests sent, by page kind.',
+               [({'kind': kind}, n) for kind, n in snapshot['requests'].items()])
+        metric('eams_crawl_errors_total', 'counter', 'Failed HTTP requests, by error class.',
+               [({'error': error}, n) for error, n in snapshot['errors'].items()])
+        metric('eams_crawl_retries_total', 'counter', 'Retried teacher requests.', [({}, snapshot['retries'])])
+        metric('eams_crawl_bytes_total', 'counter', 'Bytes downloaded.', [({}, snapshot['bytes'])])
+        metric('eams_crawl_rows_total', 'counter', 'Course rows extracted.', [({}, snapshot['rows'])])
+        metric('eams_crawl_stage_seconds_total', 'counter', 'Seconds spent per pipeline stage.',
+               [({'stage': stage}, seconds) for stage, seconds in snapshot['stage_seconds'].items()])
+
+        with self._lock:
+            buckets = list(self._latency_buckets)
+            latency_sum = self._latency_sum
+        cumulative = 0
+        samples = []
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), buckets):
+            cumulative += count
+            samples.append(({'le': bound}, cumulative))
+        metric('eams_crawl_request_duration_seconds', 'histogram', 'HTTP request latency.', [])
+        lines.extend(f'eams_crawl_request_duration_seconds_bucket{{le="{labels["le"]}"}} {value}' for labels, value in samples)
+        lines.append(f'eams_crawl_request_duration_seconds_sum {latency_sum}')
+        lines.append(f'eams_crawl_request_duration_seconds_count {cumulative}')
+
+        if snapshot['eta_s'] is not None:
+            metric('eams_crawl_eta_seconds', 'gauge', 'Estimated seconds until the crawl finishes.', [({}, snapshot['eta_s'])])
+        metric('eams_crawl_seconds_since_progress', 'gauge', 'Seconds since the last teacher finished.',
+               [({}, snapshot['seconds_since_progress'])])
+        metric('eams_crawl_stalled', 'gauge', '1 if no teacher finished within the stall threshold.',
+               [({}, int(snapshot['stalled']))])
+
+        tmp_path = self.prometheus_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.prometheus_path)
+
+
+crawl_metrics = CrawlMetrics(METRICS_FILE, args.prometheus_file, METRICS_INTERVAL, STALL_ALERT_SECONDS)
 
 
 # ===== 对教务系统-教师公共课表进行请求 =====
-
-session = requests.Session()
-session.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
-    'Accept': '*/*',
-    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-    'Connection': 'keep-alive',
-    'Cookie': EAMS_COOKIE,
-})
-
-session.get(BASE_URL + '/eams/studentPublicScheduleQuery!search.action')
-
-time.sleep(1)  # 等待 1 秒，防止请求过快
-
-session.headers.update({
-    'referer': BASE_URL + '/eams/studentPublicScheduleQuery!search.action',
-    'Accept': '*/*',
-    'Accept-Encoding': 'gzip, deflate',
-    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-    'Cache-Control': 'no-cache',
-    'Connection': 'keep-alive',
-    'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-    'Cookie': EAMS_COOKIE,
-    'Host': BASE_URL.replace('http://', '').replace('https://', ''),
-    'Origin': BASE_URL,
-    'Pragma': 'no-cache',
-    'X-Requested-With': 'XMLHttpRequest'
-})
-
-
-html_content = session.post(
-            url = BASE_URL + '/eams/studentPublicScheduleQuery!search.action',
-            data = f'semester.id={EAMS_SEMESTER_ID}&courseTableType=teacher&_={EAMS_UNDERLINE}&pageNo=1&pageSize=10000'
-).text
-
-
-
-# ===== 解析 HTML =====
-soup = BeautifulSoup(html_content, 'html.parser')
-
-teachers = []
-a_tags = soup.find_all('a', href=True)
-
-for idx, a in enumerate(a_tags, start=1):
-    name = a.get_text(strip=True)
-    relative_link = a['href']
-    full_link = BASE_URL + relative_link
-
-    # 初始化默认值为 "空"
-    gender = "空"
-    department = "空"
-
-    # 找到所在行（<tr>）
-    td_name = a.find_parent('td')
-    if td_name:
-        row = td_name.find_parent('tr')
-        if row:
-            tds = row.find_all('td')
-            # 假设结构：[0:空] | [1:姓名] | [2:性别] | [3:院系]
-            if len(tds) > 2:
-                g_text = tds[2].get_text(strip=True)
-                gender = g_text if g_text else "空"
-            if len(tds) > 3:
-                d_text = tds[3].get_text(strip=True)
-                department = d_text if d_text else "空"
-        else:
-            # 备用方案：通过全局 td 列表定位（适用于无 <tr> 的情况）
-            all_tds = soup.find_all('td')
-            try:
-                i = all_tds.index(td_name)
-                if i + 1 < len(all_tds):
-                    g_text = all_tds[i + 1].get_text(strip=True)
-                    gender = g_text if g_text else "null"
-                if i + 2 < len(all_tds):
-                    d_text = all_tds[i + 2].get_text(strip=True)
-                    department = d_text if d_text else "null"
-            except ValueError:
-                pass  # 保持默认 "null"
-
-    teachers.append({
-        '序号': idx,
-        '姓名': name,
-        '性别': gender,
-        '院系': department,
-        '链接': full_link
+def open_eams_session():
+    """创建带登录 Cookie 的会话，并先访问一次公共课表查询页"""
+    session = requests.Session()
+    session.headers.update({
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/143.0.0.0 Safari/537.36',
+        'Accept': '*/*',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Connection': 'keep-alive',
+        'Cookie': EAMS_COOKIE,
     })
 
-# ===== 将教师信息写入 CSV =====
-with open(TEACHER_LIST_OUTPUT_CSV, 'w', encoding='utf-8-sig', newline='') as csvfile:
-    fieldnames = ['序号', '姓名', '性别', '院系', '链接']
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-    writer.writerows(teachers)
+    session.get(BASE_URL + '/eams/studentPublicScheduleQuery!search.action')
+
+    time.sleep(1)  # 等待 1 秒，防止请求过快
+
+    session.headers.update({
+        'referer': BASE_URL + '/eams/studentPublicScheduleQuery!search.action',
+        'Accept': '*/*',
+        'Accept-Encoding': 'gzip, deflate',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Cache-Control': 'no-cache',
+        'Connection': 'keep-alive',
+        'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+        'Cookie': EAMS_COOKIE,
+        'Host': BASE_URL.replace('http://', '').replace('https://', ''),
+        'Origin': BASE_URL,
+        'Pragma': 'no-cache',
+        'X-Requested-With': 'XMLHttpRequest'
+    })
+    return session
+
+
+def request_with_retry(kind, send, label, stats=None):
+    """
+    经 rate_controller 限速后调用 send() 发出请求，抓取教师列表和教师课表共用同一套重试策略：
+    超时、连接错误、429 和 5xx 按指数退避重试（429/503 至少等待 Retry-After 秒），最多重试 MAX_RETRIES 次
+    返回状态码小于 400 的响应（含 304）；其他 4xx、重试后仍失败或抓取已因认证错误停止时返回 None；Cookie 失效时抛出 AuthError
+    kind 为指标中的请求类型（list / schedule），label 用于日志；请求次数、耗时、字节数和错误类型记入 stats（见 new_fetch_stats）
+    """
+    stats = stats if stats is not None else new_fetch_stats()
+    retry_count = 0
+    while True:
+        retry_count += 1
+        if rate_controller.stopped.is_set():
+            return None
+        if retry_count > 1:
+            log_print(f"{label} 第 {retry_count} 次重试...")
+
+        retry_after = 0.0
+        try:
+            waiting = time.perf_counter()
+            rate_controller.acquire()
+            started = time.perf_counter()
+            stats['rate_wait_seconds'] += started - waiting
+            stats['attempts'] += 1
+            throttled = False
+            try:
+                resp = send()
+                throttled = resp.status_code in (429, 503)
+            except requests.RequestException as e:
+                elapsed = time.perf_counter() - started
+                stats['fetch_seconds'] += elapsed
+                crawl_metrics.record_request(kind, elapsed, error=error_class(e))
+                raise
+            finally:
+                rate_controller.release(throttled)
+            elapsed = time.perf_counter() - started
+            stats['fetch_seconds'] += elapsed
+            stats['bytes'] += len(resp.content)
+            crawl_metrics.record_request(kind, elapsed, len(resp.content), None if resp.ok else f'HTTP {resp.status_code}')
+
+            if is_auth_failure(resp):
+                rate_controller.stopped.set()
+                raise AuthError(f"教务系统拒绝访问（HTTP {resp.status_code}，{resp.url}），请检查 EAMS_COOKIE 是否已失效")
+            if throttled:
+                retry_after = parse_retry_after(resp.headers.get('Retry-After'))
+
+            resp.raise_for_status()
+            return resp
+
+        except requests.HTTPError as e:
+            stats['errors'].append(error_class(e))
+            status = e.response.status_code
+            if status < 500 and status != 429:
+                log_print(f"❌ {label} 请求失败（HTTP {status}），不再重试: {e}")
+                return None
+            error = e
+        except requests.RequestException as e:
+            stats['errors'].append(error_class(e))
+            error = e
+
+        if retry_count > MAX_RETRIES:
+            log_print(f"❌ {label} 重试 {MAX_RETRIES} 次后仍失败: {error}")
+            return None
+
+        delay = max(backoff_delay(retry_count), retry_after)
+        log_print(f"❌ {label} 请求失败（第 {retry_count} 次）: {error}")
+        log_print(f"   → {delay:.1f}秒后重试...")
+        rate_controller.stopped.wait(delay)
+
+
+# ===== 获取教师列表 =====
+TEACHER_LIST_HEADERS = ['序号', '姓名', '性别', '院系', '链接']
+
+
+def fetch_teacher_list_page(session, page_no):
+    """
+    请求并解析教师列表的第 page_no 页，返回 {序号, 姓名, 性别, 院系, 链接} 字典列表（序号为页内序号）
+    按 request_with_retry 的策略重试，仍失败时抛出 RuntimeError；Cookie 失效时抛出 AuthError
+    """
+    resp = request_with_retry(
+        'list',
+        lambda: session.post(
+            url = BASE_URL + '/eams/studentPublicScheduleQuery!search.action',
+            data = f'semester.id={EAMS_SEMESTER_ID}&courseTableType=teacher&_={EAMS_UNDERLINE}'
+                   f'&pageNo={page_no}&pageSize={TEACHER_PAGE_SIZE}',
+            timeout=30,
+        ),
+        f"教师列表第 {page_no} 页",
+    )
+    if resp is None:
+        raise RuntimeError(f"教师列表第 {page_no} 页请求失败，无法取得完整的教师列表")
+    return parse_teacher_list(resp.text, BASE_URL, backend=HTML_PARSER_BACKEND)
+
+
+def _fetch_teacher_list_pages(session):
+    """
+    分页请求教师列表（最多 TEACHER_LIST_WORKERS 页同时在途），按页码顺序逐页产出 [[序号, 姓名, 性别, 院系, 链接], ...]
+    某页比第一页少，或为空、其中的教师都已出现过（页码越界时部分系统会重复返回最后一页），即视为最后一页
+    教师列表先写入临时文件，全部取完后才替换 TEACHER_LIST_OUTPUT_CSV，中途出错时不会留下不完整的列表供 --resume 沿用
+    """
+    tmp_path = TEACHER_LIST_OUTPUT_CSV + '.part'
+    seen_links = set()
+    page_size = None
+    count = 0
+
+    try:
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as csvfile, \
+                ThreadPoolExecutor(max_workers=TEACHER_LIST_WORKERS) as list_pool:
+            writer = csv.writer(csvfile)
+            writer.writerow(TEACHER_LIST_HEADERS)
+
+            pages = deque()
+            next_page_no = 1
+            for _ in range(TEACHER_LIST_WORKERS):
+                pages.append(list_pool.submit(fetch_teacher_list_page, session, next_page_no))
+                next_page_no += 1
+
+            while pages:
+                teachers = pages.popleft().result()
+                links = {teacher['链接'] for teacher in teachers}
+                if not links - seen_links:
+                    break
+                seen_links |= links
+
+                # 服务器可能限制每页的最大教师数，以第一页实际返回的教师数作为页大小
+                if page_size is None:
+                    page_size = len(teachers)
+                last_page = len(teachers) < page_size
+                if not last_page:
+                    pages.append(list_pool.submit(fetch_teacher_list_page, session, next_page_no))
+                    next_page_no += 1
+
+                rows = []
+                for teacher in teachers:
+                    count += 1
+                    rows.append([str(count), teacher['姓名'], teacher['性别'], teacher['院系'], teacher['链接']])
+                writer.writerows(rows)
+                yield rows
+
+                if last_page:
+                    break
 
-log_print(f"✅ 已成功提取 {len(teachers)} 位教师信息，并保存至 '{TEACHER_LIST_OUTPUT_CSV}'")
+            # 已经越过最后一页的请求不再需要
+            for future in pages:
+                future.cancel()
+    except BaseException:
+        # 出错（如 Cookie 失效、重试后仍失败）或被中途关闭时删除临时文件，不留下不完整的列表
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    os.replace(tmp_path, TEACHER_LIST_OUTPUT_CSV)
+    crawl_metrics.teacher_total = count
+    log_print(f"✅ 已成功提取 {count} 位教师信息，并保存至 '{TEACHER_LIST_OUTPUT_CSV}'")
+
+
+def stream_teacher_list(session):
+    """
+    逐位产出教师列表的 (行号, [序号, 姓名, 性别, 院系, 链接])，第一页解析完即开始产出，课表抓取不必等整个教师列表下载完
+    各页由后台线程持续请求，不受课表抓取进度的限制，列表很快取完，进度记录中的预计剩余时间也就能尽早算出
+    """
+    pages = queue.SimpleQueue()
+
+    def fetch_all():
+        try:
+            for rows in _fetch_teacher_list_pages(session):
+                pages.put(rows)
+            pages.put(None)
+        except BaseException as e:
+            pages.put(e)
+
+    threading.Thread(target=fetch_all, name='teacher-list', daemon=True).start()
+    while True:
+        rows = pages.get()
+        if rows is None:
+            return
+        if isinstance(rows, BaseException):
+            raise rows
+        for row in rows:
+            yield int(row[0]), row
+
+
+def read_teacher_list():
+    """读取已有的 TEACHER_LIST_OUTPUT_CSV，返回 (行号, 行) 的迭代器"""
+    with open(TEACHER_LIST_OUTPUT_CSV, 'r', encoding='utf-8-sig') as f_in:
+        reader = csv.reader(f_in)
+        next(reader, None)  # 跳过表头
+        rows = list(reader)
+    crawl_metrics.teacher_total = len(rows)
+    return enumerate(rows, start=1)
+
+
+# ===== 抓取单个教师的课表页 =====
+def timed_parse_course_rows(html, backend):
+    """在解析进程中运行，返回 (课程行, 解析耗时秒数)"""
+    started = time.perf_counter()
+    rows = parse_course_rows(html, backend=backend)
+    return rows, time.perf_counter() - started
+
+
+def fetch_teacher(session, parse_pool, stats, row_idx, teacher_info, url):
+    """
+    请求教师课表页，返回 (课程行列表或解析任务, 待写入的缓存项)
+    页面未变化时直接返回缓存的课程行；否则把页面交给解析进程池（PARSE_WORKERS 为 0 时在本线程中解析），
+    返回对应的 Future（结果为 (课程行, 解析耗时)）
+    按 request_with_retry 的策略重试，放弃时返回 None；Cookie 失效时抛出 AuthError。请求统计记入 stats（见 new_fetch_stats）
+    """
+    cached = page_cache.get(url) if page_cache else None
+
+    # 带上缓存的校验信息发起条件请求，页面未变化时服务器可直接返回 304
+    conditional_headers = {}
+    if cached:
+        if cached.get('etag'):
+            conditional_headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            conditional_headers['If-Modified-Since'] = cached['last_modified']
+
+    log_print(f"[{row_idx}] 正在请求教师: {teacher_info} | URL: {url}")
+    resp = request_with_retry(
+        'schedule',
+        lambda: session.get(url, timeout=15, headers=conditional_headers),
+        f"[{row_idx}] 教师 {teacher_info}",
+        stats,
+    )
+    if resp is None:
+        return None
+
+    if resp.status_code == 304 and cached:
+        log_print(f"✅ 教师 {teacher_info} 课表未变化（304），沿用缓存的 {len(cached['rows'])} 条课程")
+        stats['status'] = 'not_modified'
+        return cached['rows'], None
+
+    content_hash = hashlib.sha256(resp.content).hexdigest()
+    if cached and cached['hash'] == content_hash:
+        # 内容未变但服务器换了校验信息（如重启后 ETag 变化）时更新缓存，否则之后的条件请求都无法命中 304
+        validators = {'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified')}
+        if validators != {'etag': cached.get('etag'), 'last_modified': cached.get('last_modified')}:
+            page_cache.put(url, dict(cached, **validators))
+        log_print(f"✅ 教师 {teacher_info} 课表内容未变化，沿用缓存的 {len(cached['rows'])} 条课程")
+        stats['status'] = 'unchanged'
+        return cached['rows'], None
+
+    resp.encoding = 'utf-8'
+    stats['status'] = 'ok'
+    if parse_pool is None:
+        # 与进程池一样以 Future 返回，解析失败时由写出流程统一跳过该教师
+        rows = Future()
+        try:
+            rows.set_result(timed_parse_course_rows(resp.text, HTML_PARSER_BACKEND))
+        except Exception as e:
+            rows.set_exception(e)
+    else:
+        rows = parse_pool.submit(timed_parse_course_rows, resp.text, HTML_PARSER_BACKEND)
+    cache_entry = {
+        'etag': resp.headers.get('ETag'),
+        'last_modified': resp.headers.get('Last-Modified'),
+        'hash': content_hash,
+    }
+    return rows, cache_entry
 
-time.sleep(1)  # 等待 1 秒，防止请求过快
 
-# ===== 初始化课程输出 CSV =====
-output_headers = [
+# ===== 抓取全部教师的已排课表 =====
+OUTPUT_HEADERS = [
     "序号", "课程序号", "课程代码", "课程名称", "课程类别", "教学班",
     "周课时", "学分", "授课语言", "上课人数", "是否排课", "周次",
     "星期", "节次", "授课教师", "上课地点", "备注"
 ]
 
-with open(LESSONS_LIST_OUTPUT_CSV, 'w', encoding='utf-8-sig', newline='') as f:
-    csv.writer(f).writerow(output_headers)
 
-total_extracted = 0
+def iter_teacher_tasks(teacher_rows, done_urls):
+    """由教师列表的 (行号, 行) 逐个产出待抓取的 (行号, 教师, 链接)，跳过无效行和 done_urls 中已完成的教师"""
+    for row_idx, row in teacher_rows:
+        if len(row) < 5:
+            log_print(f"[{row_idx}] ⚠️ 行数据不足5列，跳过: {row}")
+            continue
 
+        teacher_info = row[1].strip()
+        url = row[4].strip()
 
-# ===== 开始处理课程列表 =====
-log_print(f"开始处理教师排课数据，输入文件: {TEACHER_LIST_OUTPUT_CSV}")
+        if not url or not url.startswith('http'):
+            log_print(f"[{row_idx}] ⚠️ 无效URL，跳过教师: {teacher_info}")
+            continue
 
-try:
-    with open(TEACHER_LIST_OUTPUT_CSV, 'r', encoding='utf-8-sig') as f_in:
-        reader = csv.reader(f_in)
-        header = next(reader, None)  # 跳过表头
-
-        for row_idx, row in enumerate(reader, start=1):
-            if len(row) < 5:
-                log_print(f"[{row_idx}] ⚠️ 行数据不足5列，跳过: {row}")
-                continue
+        if url in done_urls:
+            continue
 
-            teacher_info = row[1].strip()
-            url = row[4].strip()
+        yield row_idx, teacher_info, url
 
-            if not url or not url.startswith('http'):
-                log_print(f"[{row_idx}] ⚠️ 无效URL，跳过教师: {teacher_info}")
-                continue
-
-            retry_count = 0
-            while True:
-                retry_count += 1
-                if retry_count > 1:
-                    log_print(f"[{row_idx}] 教师 {teacher_info} 第 {retry_count} 次重试...")
-
-                try:
-                    log_print(f"[{row_idx}] 正在请求教师: {teacher_info} | URL: {url}")
-
-                    resp = session.get(url, timeout=15)
-                    resp.raise_for_status()
-                    resp.encoding = 'utf-8'
-                    html = resp.text
-
-                    soup = BeautifulSoup(html, 'html.parser')
-                    scheduled_span = soup.find('span', string='已排课')
-
-                    course_rows = []
-                    if scheduled_span:
-                        scheduled_table = scheduled_span.find_next('table')
-                        if scheduled_table:
-                            data_trs = scheduled_table.find_all('tr')[1:]
-                            for tr in data_trs:
-                                if tr.find('td', colspan=True):
-                                    continue
-                                tds = tr.find_all(['td', 'th'])
-                                if not tds:
-                                    continue
-                                row_data = []
-                                for td in tds:
-                                    text = td.get_text(strip=True)
-                                    row_data.append(text if text else "null")
-                                while len(row_data) < 17:
-                                    row_data.append("null")
-                                course_rows.append(row_data[:17])
-
-                    with open(LESSONS_LIST_OUTPUT_CSV, 'a', encoding='utf-8-sig', newline='') as out_f:
-                        csv.writer(out_f).writerows(course_rows)
-
-                    current_count = len(course_rows)
-                    total_extracted += current_count
-                    log_print(f"✅ 教师 {teacher_info} 成功提取 {current_count} 条课程（第 {retry_count} 次尝试）")
-                    break
 
-                except Exception as e:
-                    log_print(f"❌ 教师 {teacher_info} 处理失败（第 {retry_count} 次）: {e}")
-                    log_print("   → 1秒后重试...")
-                    time.sleep(1)
+def crawl_lessons(session, teacher_rows):
+    """
+    teacher_rows 为教师列表的 (行号, 行)，可以是边下载边产出的 stream_teacher_list()
+    按 抓取线程池 → 解析进程池 → 主线程写出 的流水线抓取所有教师的已排课表
+    已提交但尚未写出的教师最多 PIPELINE_DEPTH 位，写出跟不上时暂停提交新的抓取任务
+    """
+    journal = CrawlJournal(CHECKPOINT_FILE)
+    done_urls, last_offset = journal.load() if args.resume else (set(), None)
 
-            time.sleep(1)
+    if last_offset is not None and os.path.exists(LESSONS_LIST_OUTPUT_CSV):
+        # 截掉上次中断时已写入但未记入断点日志的课程行
+        with open(LESSONS_LIST_OUTPUT_CSV, 'r+b') as f:
+            f.truncate(last_offset)
+        log_print(f"续抓模式：断点日志中已完成 {len(done_urls)} 位教师，将跳过这些教师")
+    else:
+        done_urls = set()
+        with open(LESSONS_LIST_OUTPUT_CSV, 'w', encoding='utf-8-sig', newline='') as f:
+            csv.writer(f).writerow(OUTPUT_HEADERS)
+        journal.reset()
+    crawl_metrics.resumed = len(done_urls)
+
+    total_extracted = 0
+    failed_teachers = []
+
+    log_print(f"开始处理教师排课数据（并发线程数: {CRAWL_WORKERS}）")
+
+    writer = LessonWriter(LESSONS_LIST_OUTPUT_CSV, journal, WRITE_BATCH_SIZE)
+    # 此时日志、教师列表和指标线程都已在运行，fork 出的解析进程可能继承被其他线程持有的锁而死锁，
+    # 因此在所有平台上都以 spawn 方式启动解析进程
+    parse_pool = ProcessPoolExecutor(
+        max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context('spawn')
+    ) if PARSE_WORKERS != 0 else None
+    try:
+        with ThreadPoolExecutor(max_workers=CRAWL_WORKERS) as fetch_pool:
+            pending = deque()
+            # 教师列表按需逐个取出，列表还在下载时即可开始抓取已到达的教师
+            task_iter = iter_teacher_tasks(teacher_rows, done_urls)
+
+            def submit_next():
+                task = next(task_iter, None)
+                if task is not None:
+                    stats = new_fetch_stats()
+                    pending.append((task, stats, fetch_pool.submit(fetch_teacher, session, parse_pool, stats, *task)))
+
+            for _ in range(PIPELINE_DEPTH):
+                submit_next()
+
+            # 按教师列表顺序依次写出结果，保证输出与顺序抓取完全一致
+            while pending:
+                (row_idx, teacher_info, url), stats, future = pending.popleft()
+                submit_next()
+
+                waiting = time.perf_counter()
+                fetched = future.result()
+                crawl_metrics.add_stage('wait_fetch', time.perf_counter() - waiting)
+                if fetched is None:
+                    # 失败的教师不记入断点日志，之后 --resume 时会重新抓取
+                    stats['status'] = 'failed'
+                    crawl_metrics.record_teacher(row_idx, teacher_info, stats, 0)
+                    failed_teachers.append(teacher_info)
+                    continue
+
+                course_rows, cache_entry = fetched
+                if isinstance(course_rows, Future):
+                    waiting = time.perf_counter()
+                    try:
+                        course_rows, stats['parse_seconds'] = course_rows.result()
+                    except Exception as e:
+                        log_print(f"❌ 教师 {teacher_info} 课表解析失败，跳过该教师: {e}")
+                        stats['status'] = 'failed'
+                        stats['errors'].append(error_class(e))
+                        crawl_metrics.record_teacher(row_idx, teacher_info, stats, 0)
+                        failed_teachers.append(teacher_info)
+                        continue
+                    finally:
+                        crawl_metrics.add_stage('wait_parse', time.perf_counter() - waiting)
+                if cache_entry is not None:
+                    log_print(f"✅ 教师 {teacher_info} 成功提取 {len(course_rows)} 条课程")
+                    if page_cache:
+                        page_cache.put(url, dict(cache_entry, rows=course_rows))
+
+                writer.write(url, course_rows)
+                total_extracted += len(course_rows)
+                crawl_metrics.record_teacher(row_idx, teacher_info, stats, len(course_rows))
+    finally:
+        # 中途出错时也把已完整抓取的教师写出并记入断点日志
+        writer.close()
+        if parse_pool is not None:
+            parse_pool.shutdown(cancel_futures=True)
 
     log_print(f"\n🎉 所有教师处理完毕！共提取 {total_extracted} 条已排课记录，保存至 '{LESSONS_LIST_OUTPUT_CSV}'")
+    if failed_teachers:
+        log_print(f"⚠️ 有 {len(failed_teachers)} 位教师抓取失败: {', '.join(failed_teachers)}")
+        log_print("   → 可稍后使用 --resume 参数补抓这些教师")
+
+
+# ===== 课程后处理 =====
+DEDUP_KEY_COLUMNS = [2, 5, 11, 12, 13, 15]  # 判重的列（按0起始索引）：课程代码、教学班、周次、星期、节次、上课地点
+LOCATION_COLUMN = 15  # 上课地点所在列
+
+
+def post_process_lessons():
+    """
+    只读取一遍课程列表，同时生成：
+    - LESSONS_DEDUP_LIST_OUTPUT_CSV：按关键列去重，并去除上课地点中的星号
+    - CLASSROOM_LIST_OUTPUT_TXT：所有教室名去重后按升序排列，一行一个
+    - LESSONS_COMPILED_OUTPUT：去重课程的预编译 Feather 文件（已安装 pyarrow 时）
+    - LESSONS_CONFLICT_REPORT_CSV：排课冲突报告
+    去重时内存中只保留已出现过的关键列哈希值，占用与不重复的课程数成正比，与文件大小无关
+    """
+    seen = set()
+    classrooms = set()
+    kept_rows = []  # 保留的行，用于生成预编译文件
+    total = 0
+    kept = 0
+
+    with open(LESSONS_LIST_OUTPUT_CSV, 'r', encoding='utf-8-sig', newline='') as f_in, \
+            open(LESSONS_DEDUP_LIST_OUTPUT_CSV, 'w', encoding='utf-8-sig', newline='') as f_out:
+        reader = csv.reader(f_in)
+        writer = csv.writer(f_out)
+
+        header = next(reader, [])
+        # 检查列索引是否有效
+        if len(header) <= max(DEDUP_KEY_COLUMNS):
+            raise IndexError("指定的列索引超出CSV文件实际列数，请检查文件格式。")
+        writer.writerow(header)
+
+        for row in reader:
+            total += 1
+            # 爬虫用 "null" 表示空单元格，输出时写为空值；列数不足的行补齐
+            row = ['' if value == 'null' else value for value in row]
+            row.extend([''] * (len(header) - len(row)))
+
+            # 用关键列元组的 64 位哈希值判重，保留第一次出现的行（百万行量级下哈希冲突的概率可忽略）
+            # 被去掉的重复行与保留行的上课地点相同，因此只需从保留的行中收集教室
+            key = hash(tuple(row[i] for i in DEDUP_KEY_COLUMNS))
+            if key in seen:
+                continue
+            seen.add(key)
 
-except Exception as e:
-    log_print(f"💥 主程序崩溃: {e}")
-    raise
-
-
-# ===== 对课程进行去重 =====
-
-# 读取 CSV 文件
-df = pd.read_csv(LESSONS_LIST_OUTPUT_CSV)
-
-# 指定要拼接的列（按0起始索引）
-cols_to_combine = [2, 5, 11, 12, 13, 15]  # 对应第3,6,12,13,14,16列
-
-# 检查列索引是否有效
-max_col_index = df.shape[1] - 1
-if max(cols_to_combine) > max_col_index:
-    raise IndexError("指定的列索引超出CSV文件实际列数，请检查文件格式。")
-
-# 提取这些列，并将每行拼接为一个字符串作为唯一标识
-# 使用 fillna('') 防止 NaN 导致拼接出问题
-df_subset = df.iloc[:, cols_to_combine].fillna('').astype(str)
-df['combined_key'] = df_subset.apply('_|_'.join, axis=1)  # 使用特殊分隔符避免字段混淆
-
-# 去重：保留第一次出现的行（基于 combined_key）
-df_dedup = df.drop_duplicates(subset='combined_key', keep='first')
-
-# 删除辅助列
-df_dedup = df_dedup.drop(columns=['combined_key'])
-
-# 保存结果到新文件（可选）
-df_dedup.to_csv('lessons_list_dedup.csv', index=False, encoding='utf-8-sig')
-
-log_print("\n课程去重")
-log_print(f"原始行数: {len(df)}")
-log_print(f"去重后行数: {len(df_dedup)}")
-log_print(f"去重结果已保存到 {LESSONS_DEDUP_LIST_OUTPUT_CSV}")
-
-# ===== 去除教室名的星号 =====
-# 读取 CSV 文件
-file_path = LESSONS_DEDUP_LIST_OUTPUT_CSV
-df = pd.read_csv(file_path, dtype=str)  # 以字符串类型读取，避免类型问题
-
-# 检查是否有至少16列
-if df.shape[1] < 16:
-    raise ValueError(f"CSV 文件列数不足16列，当前只有 {df.shape[1]} 列。")
-
-# 去除第16列（索引15）中的所有星号 *
-df.iloc[:, 15] = df.iloc[:, 15].astype(str).str.replace('*', '', regex=False)
-
-# 写回原文件（覆盖）
-df.to_csv(file_path, index=False, encoding='utf-8-sig')
-
-log_print(f"已成功去除 {file_path} 中第16列的所有 '*'，并保存回原文件。")
-
+            location = row[LOCATION_COLUMN]
+            classrooms.update(split_classrooms(location))
+            row[LOCATION_COLUMN] = location.replace('*', '')
+            writer.writerow(row)
+            kept_rows.append(row)
+            kept += 1
 
-# ===== 处理教室列表 =====
-df = pd.read_csv(LESSONS_LIST_OUTPUT_CSV)
+    log_print("\n课程去重")
+    log_print(f"原始行数: {total}")
+    log_print(f"去重后行数: {kept}")
+    log_print(f"去重结果已保存到 {LESSONS_DEDUP_LIST_OUTPUT_CSV}，并已去除上课地点中的所有 '*'")
 
-if '上课地点' in df.columns:
-    p_column = df['上课地点']
+    # 教室列表按升序写出，一行一个
+    with open(CLASSROOM_LIST_OUTPUT_TXT, 'w', encoding='utf-8') as f:
+        f.writelines("默认校区:默认楼宇:" + item + '\n' for item in sorted(classrooms))
 
-# 用于去重和保持顺序
-seen = set()
-unique_items = []
+    log_print(f"共写入 {len(classrooms)} 个教室到 {CLASSROOM_LIST_OUTPUT_TXT}（已按升序排序）")
 
-# 遍历 P 列的每一行（跳过空值）
-for value in p_column.dropna():
-    # 转为字符串并去除首尾空白
-    str_value = str(value).strip()
-    
-    # 按逗号分割（支持“a,b,c”形式）
-    if ',' in str_value:
-        parts = [part.strip() for part in str_value.split(',')]
+    compiled = compile_lessons(pd.DataFrame(kept_rows, columns=header, dtype=str))
+    if feather is None:
+        log_print(f"⚠️ 未安装 pyarrow，跳过生成预编译课程文件 {LESSONS_COMPILED_OUTPUT}")
     else:
-        parts = [str_value]
-    
-    # 处理每个部分
-    for part in parts:
-        # 去除星号 *
-        cleaned = part.replace('*', '').strip()
-        # 忽略空字符串，并去重
-        if cleaned and cleaned not in seen:
-            seen.add(cleaned)
-            unique_items.append(cleaned)
-
-# 写入 txt 文件，一行一个
-with open(CLASSROOM_LIST_OUTPUT_TXT, 'w', encoding='utf-8') as f:
-    for item in unique_items:
-        f.write("默认校区:默认楼宇:" + item + '\n')
+        write_compiled_lessons(compiled, LESSONS_COMPILED_OUTPUT)
+        log_print(f"预编译课程文件已保存到 {LESSONS_COMPILED_OUTPUT}")
 
-print(f"共写入 {len(unique_items)} 个教室到 {CLASSROOM_LIST_OUTPUT_TXT}")
+    # 排课冲突检测：同一教室/教师/教学班在重叠的时间段内有两门课
+    conflicts = find_conflicts(compiled)
+    write_conflict_report(conflicts, LESSONS_CONFLICT_REPORT_CSV)
+    log_print(f"排课冲突：{summarize_conflicts(conflicts)}，报告已保存到 {LESSONS_CONFLICT_REPORT_CSV}")
 
 
-# ===== 对教室列表文件按升序排序 =====
-file_path = CLASSROOM_LIST_OUTPUT_TXT
+# ===== 主流程 =====
+def main():
+    log_listener = start_logging()
+    try:
+        session = open_eams_session()
 
-with open(file_path, 'r', encoding='utf-8') as f:
-    lines = f.readlines()
-
-# 去除每行末尾的换行符（便于排序），并过滤空行（可选）
-stripped_lines = [line.rstrip('\n\r') for line in lines]
-
-# 升序排序（默认是字典序，区分大小写）
-sorted_lines = sorted(stripped_lines)
-
-# 将排序后的行重新加上换行符
-output_lines = [line + '\n' for line in sorted_lines]
-
-# 写回原文件
-with open(file_path, 'w', encoding='utf-8') as f:
-    f.writelines(output_lines)
-
-log_print(f"教室列表 {file_path} 已按升序排序并保存。")
\ No newline at end of file
+        if args.resume and os.path.exists(TEACHER_LIST_OUTPUT_CSV):
+            log_print(f"续抓模式：沿用已有的教师列表 '{TEACHER_LIST_OUTPUT_CSV}'")
+            teacher_rows = read_teacher_list()
+        else:
+            teacher_rows = stream_teacher_list(session)
+
+        crawl_metrics.start(append=args.resume)
+        try:
+            crawl_lessons(session, teacher_rows)
+        except Exception as e:
+            log_print(f"💥 主程序崩溃: {e}")
+            log_print(f"   → 已完成的教师记录在 '{CHECKPOINT_FILE}'，可使用 --resume 参数续抓")
+            raise
+        finally:
+            crawl_metrics.stop()
+
+        post_process_lessons()
+    finally:
+        log_listener.stop()
+
+
+# 解析进程池以 spawn 方式启动，子进程会重新导入本脚本，因此主流程必须放在这里
+if __name__ == '__main__':
+    main()
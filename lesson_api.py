@@ -0,0 +1,245 @@
+"""
+课程查询 HTTP 接口
+
+供教室预约机器人、电子班牌等程序直接查询课程，不必抓取 Streamlit 页面。
+与检索网页使用同一套数据文件和查询逻辑（lesson_query），数据文件更新后自动重新加载。
+
+用法：python lesson_api.py [--host 127.0.0.1] [--port 8502]
+
+接口（均为 GET）：
+- /lessons?week=7&room=文管A101&periods=3,4      课程列表（JSON）
+- /timetable?week=7&room=文管A101                课表 HTML 片段，与网页中的日历视图相同
+- /free_rooms?week=7&weekdays=2&periods=3,4      空闲教室列表（JSON）
+/lessons 和 /timetable 还支持 weekdays、course、teacher、location 参数；
+/free_rooms 还支持 campus、building 参数。week 必填，periods、weekdays 为逗号分隔的整数，
+weekdays 中 0 为星期日；week、weekdays、periods 超出范围（周次 1~62、星期 0~6、节次 1~30）时返回 400。响应带有由数据版本和查询条件得出的 ETag，
+客户端带 If-None-Match 请求且数据未变化时返回 304。
+"""
+import argparse
+import hashlib
+import json
+import logging
+import sys
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from lesson_query import (
+    DEFAULT_DATA_PATHS, DataLoadError, QueryCache, cached_filter_rows, find_free_rooms, lesson_records,
+    normalize_filter_state, render_timetable, start_data_reloader,
+)
+from lesson_schedule import MAX_PERIOD_BIT, MAX_WEEK_BIT
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+
+DATA_RELOAD_INTERVAL = 5  # 检查数据文件是否变化的间隔（秒）
+RESPONSE_MAX_AGE = 5  # 客户端可以直接使用缓存响应的时间（秒），之后需带 ETag 重新验证
+QUERY_CACHE_SIZE = 1024
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_BYTES = 64 * 2 ** 20  # 响应缓存中响应内容的总字节数上限，大的查询结果可达数百 KB
+CACHE_TTL = 600
+
+logger = logging.getLogger('lesson_api')
+
+
+# ===========================================
+# 参数解析
+# ===========================================
+def _check_range(name, value, low, high):
+    if not low <= value <= high:
+        raise ValueError(f"参数 {name} 应在 {low}~{high} 之间，收到 {value}")
+    return value
+
+
+def _int(params, name, low, high, required=False):
+    if name not in params:
+        if required:
+            raise ValueError(f"缺少参数 {name}")
+        return None
+    try:
+        value = int(params[name])
+    except ValueError:
+        raise ValueError(f"参数 {name} 应为整数")
+    return _check_range(name, value, low, high)
+
+
+def _int_list(params, name, low, high):
+    try:
+        values = [int(value) for value in params.get(name, '').split(',') if value.strip()]
+    except ValueError:
+        raise ValueError(f"参数 {name} 应为以逗号分隔的整数")
+    return [_check_range(name, value, low, high) for value in values]
+
+
+# 各参数的取值范围，超出范围时返回 400，而不是查出错误的结果或使占用表越界
+def _week(params):
+    return _int(params, 'week', 1, MAX_WEEK_BIT, required=True)
+
+
+def _weekdays(params):
+    return _int_list(params, 'weekdays', 0, 6)
+
+
+def _periods(params):
+    return _int_list(params, 'periods', 1, MAX_PERIOD_BIT)
+
+
+def _filter_state(params):
+    return normalize_filter_state(
+        week=_week(params),
+        course_name=params.get('course', ''),
+        teacher_name=params.get('teacher', ''),
+        periods=_periods(params),
+        weekdays=_weekdays(params),
+        location=params.get('location', ''),
+        room=params.get('room', ''),
+    )
+
+
+# ===========================================
+# 接口
+# 每个接口把查询参数规范化为缓存键，并返回生成响应内容的函数
+# ===========================================
+def _json_body(payload):
+    return 'application/json; charset=utf-8', json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def lessons_endpoint(server, data, params):
+    state = _filter_state(params)
+
+    def build():
+        rows = cached_filter_rows(server.query_cache, data.dataset, state)
+        return _json_body({'week': state.week, 'count': len(rows), 'lessons': lesson_records(data.dataset.df, rows)})
+    return state, build
+
+
+def timetable_endpoint(server, data, params):
+    state = _filter_state(params)
+
+    def build():
+        rows = cached_filter_rows(server.query_cache, data.dataset, state)
+        return 'text/html; charset=utf-8', render_timetable(data.dataset.df.iloc[rows]).encode('utf-8')
+    return state, build
+
+
+def free_rooms_endpoint(server, data, params):
+    key = (
+        _week(params),
+        tuple(sorted(set(_weekdays(params)))),
+        tuple(sorted(set(_periods(params)))),
+        params.get('campus', ''),
+        params.get('building', ''),
+    )
+
+    def build():
+        free_rooms = find_free_rooms(data, *key)
+        return _json_body({'week': key[0], 'count': len(free_rooms), 'rooms': free_rooms.to_dict('records')})
+    return key, build
+
+
+ENDPOINTS = {
+    '/lessons': lessons_endpoint,
+    '/timetable': timetable_endpoint,
+    '/free_rooms': free_rooms_endpoint,
+}
+
+
+# ===========================================
+# HTTP 服务
+# ===========================================
+class LessonAPIServer(ThreadingHTTPServer):
+    """每个请求一个线程；数据、筛选结果缓存和响应缓存由所有请求共享"""
+
+    daemon_threads = True
+
+    def __init__(self, address, reloader):
+        super().__init__(address, LessonAPIHandler)
+        self.reloader = reloader
+        self.query_cache = QueryCache(QUERY_CACHE_SIZE, CACHE_TTL)
+        # (接口, 缓存键) → (Content-Type, 响应内容)，数据版本变化时清空，按响应内容的总字节数淘汰
+        self.response_cache = QueryCache(
+            RESPONSE_CACHE_SIZE, CACHE_TTL, maxbytes=RESPONSE_CACHE_BYTES, sizeof=lambda response: len(response[1])
+        )
+
+
+class LessonAPIHandler(BaseHTTPRequestHandler):
+    server_version = 'LessonAPI/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = ENDPOINTS.get(url.path)
+        if endpoint is None:
+            self._send_error(HTTPStatus.NOT_FOUND, f"未知的接口 {url.path}，可用接口: {', '.join(ENDPOINTS)}")
+            return
+
+        # 同名参数以最后一个为准；本次请求始终使用同一份数据，即使期间数据被重新加载
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        data = self.server.reloader.current
+        try:
+            key, build = endpoint(self.server, data, params)
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        # ETag 只取决于数据版本和查询条件，客户端缓存仍有效时不必生成响应内容
+        cache_key = (url.path, key)
+        etag = '"' + hashlib.sha1(repr((data.version, cache_key)).encode('utf-8')).hexdigest()[:20] + '"'
+        if etag in self._if_none_match():
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._send_cache_headers(etag)
+            self.end_headers()
+            return
+
+        content_type, body = self.server.response_cache.get_or_compute(data.version, cache_key, build)
+        self.send_response(HTTPStatus.OK)
+        self._send_cache_headers(etag)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _if_none_match(self):
+        header = self.headers.get('If-None-Match', '')
+        return {tag.strip().removeprefix('W/') for tag in header.split(',') if tag.strip()}
+
+    def _send_cache_headers(self, etag):
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', f'public, max-age={RESPONSE_MAX_AGE}')
+
+    def _send_error(self, status, message):
+        content_type, body = _json_body({'error': message})
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='课程查询 HTTP 接口')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'监听地址（默认 {DEFAULT_HOST}）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'监听端口（默认 {DEFAULT_PORT}）')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        reloader = start_data_reloader(DEFAULT_DATA_PATHS, DATA_RELOAD_INTERVAL)
+    except DataLoadError as e:
+        sys.exit(f"❌ {e}")
+    server = LessonAPIServer((args.host, args.port), reloader)
+    logger.info("课程查询接口已启动: http://%s:%d/lessons?week=1", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        reloader.stop()
+
+
+if __name__ == '__main__':
+    main()
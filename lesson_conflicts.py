@@ -0,0 +1,161 @@
+"""
+排课冲突检测
+
+找出同一教室、同一教师或同一教学班在同一星期、同一节次、且周次有重叠的两门课程。
+每门课程的上课时间已预编译为 星期 + 节次位掩码 + 周次位掩码，检测时先把课程按
+(资源, 星期, 节次) 分桶，只在同一桶内两两比较周次位掩码，不必对全部课程做 O(n²) 比较。
+课程序号相同的两行属于同一次上课（如合班、多位教师），不算冲突。
+
+可单独运行：python lesson_conflicts.py [课程CSV] [报告CSV]
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from lesson_schedule import (
+    MAX_PERIOD_BIT, MAX_WEEK_BIT, PERIOD_MASK_COLUMN, WEEK_MASK_COLUMN, WEEKDAY_COLUMN, WEEKDAY_TO_COL,
+    compile_lessons, from_mask, split_classrooms,
+)
+
+LESSONS_CSV = 'lessons_list_dedup.csv'
+CONFLICT_REPORT_CSV = 'lesson_conflicts.csv'
+
+# 资源类型 → 课程表中的列
+RESOURCE_COLUMNS = {'教室': '上课地点', '教师': '授课教师', '教学班': '教学班'}
+# 报告中列出的课程信息，两门课程分别加后缀 A、B
+LESSON_INFO_COLUMNS = ['课程序号', '课程名称', '授课教师', '教学班']
+REPORT_COLUMNS = ['资源类型', '资源', '星期', '冲突周次', '冲突节次'] + [
+    col + suffix for suffix in ('A', 'B') for col in LESSON_INFO_COLUMNS
+]
+
+WEEKDAY_NAMES = ["星期" + d for d in sorted(WEEKDAY_TO_COL, key=WEEKDAY_TO_COL.get)]
+
+
+def split_resources(kind, value):
+    """把单元格拆分为资源名列表，多个教师/教学班以逗号分隔"""
+    if value == 'null':
+        return []
+    if kind == '教室':
+        return split_classrooms(value)
+    return [name.strip() for name in value.replace('，', ',').split(',') if name.strip()]
+
+
+def format_numbers(numbers):
+    """[1, 2, 3, 5] → "1-3,5" """
+    parts = []
+    start = prev = None
+    for n in numbers:
+        if prev is not None and n == prev + 1:
+            prev = n
+            continue
+        if start is not None:
+            parts.append(str(start) if start == prev else f"{start}-{prev}")
+        start = prev = n
+    if start is not None:
+        parts.append(str(start) if start == prev else f"{start}-{prev}")
+    return ','.join(parts)
+
+
+def _format_masks(masks, max_bit):
+    """位掩码列 → "1-3,5" 形式的文字，相同的掩码只格式化一次"""
+    uniques = masks.unique()
+    return masks.map(dict(zip(uniques, (format_numbers(from_mask(m, max_bit)) for m in uniques)))).to_numpy()
+
+
+def _resource_slots(df, kind, col, rows, period_bits):
+    """展开为 (资源, 行号, 节次) 三列，同一上课地点/教师只拆分一次"""
+    categories = df[col].cat.categories
+    names = pd.Series([split_resources(kind, str(value)) for value in categories], dtype=object)
+    codes = df[col].cat.codes.to_numpy()[rows]
+    resources = pd.DataFrame({'资源': names.iloc[codes].to_numpy(), '行号': rows}).explode('资源').dropna()
+
+    # 每个 (资源, 行) 再按该行占用的每一个节次展开
+    bit_rows, bit_periods = np.nonzero(period_bits[resources.index.to_numpy()])
+    return pd.DataFrame({
+        '资源': resources['资源'].to_numpy()[bit_rows],
+        '行号': resources['行号'].to_numpy()[bit_rows],
+        '节次': bit_periods + 1,
+    })
+
+
+def find_conflicts(df):
+    """对预编译课程表做冲突检测，返回每一对冲突课程一行的报告（列见 REPORT_COLUMNS）"""
+    df = df.reset_index(drop=True)
+    weekdays = df[WEEKDAY_COLUMN].to_numpy()
+    weeks = df[WEEK_MASK_COLUMN].to_numpy()
+    periods = df[PERIOD_MASK_COLUMN].to_numpy()
+    rows = np.flatnonzero((weekdays >= 0) & (weeks != 0) & (periods != 0))
+    # period_bits[i, p - 1] 表示 rows[i] 这一行第 p 节是否有课
+    period_bits = ((periods[rows, None] >> np.arange(1, MAX_PERIOD_BIT + 1)) & 1) != 0
+    lesson_ids = df['课程序号'].astype(str).to_numpy() if '课程序号' in df.columns else None
+
+    reports = []
+    for kind, col in RESOURCE_COLUMNS.items():
+        if col not in df.columns:
+            continue
+        slots = _resource_slots(df, kind, col, rows, period_bits)
+        slots['星期'] = weekdays[slots['行号'].to_numpy()]
+
+        # 同一 (资源, 星期, 节次) 桶内两两配对，再比较周次位掩码
+        pairs = slots.merge(slots, on=['资源', '星期', '节次'], suffixes=('A', 'B'))
+        row_a = pairs['行号A'].to_numpy()
+        row_b = pairs['行号B'].to_numpy()
+        overlap = weeks[row_a] & weeks[row_b]
+        keep = (row_a < row_b) & (overlap != 0)
+        if lesson_ids is not None:
+            keep &= lesson_ids[row_a] != lesson_ids[row_b]
+        pairs = pairs[keep].assign(周次=overlap[keep], 节次=np.left_shift(1, pairs['节次'][keep].to_numpy()))
+        if pairs.empty:
+            continue
+
+        # 同一对课程在多个节次冲突时合并为一行；各节次的位互不重叠，求和即按位或
+        merged = pairs.groupby(['资源', '行号A', '行号B', '星期'], sort=False).agg(
+            周次=('周次', 'first'), 节次=('节次', 'sum')
+        ).reset_index()
+        report = pd.DataFrame({
+            '资源类型': kind,
+            '资源': merged['资源'],
+            '星期': np.array(WEEKDAY_NAMES)[merged['星期'].to_numpy()],
+            '冲突周次': _format_masks(merged['周次'], MAX_WEEK_BIT),
+            '冲突节次': _format_masks(merged['节次'], MAX_PERIOD_BIT),
+        })
+        for suffix in ('A', 'B'):
+            lessons = df.iloc[merged['行号' + suffix].to_numpy()]
+            for info_col in LESSON_INFO_COLUMNS:
+                values = lessons[info_col].astype(str).to_numpy() if info_col in df.columns else ''
+                report[info_col + suffix] = values
+        reports.append(report)
+
+    if not reports:
+        return pd.DataFrame(columns=REPORT_COLUMNS)
+    return pd.concat(reports, ignore_index=True).sort_values(
+        ['资源类型', '资源', '星期', '冲突节次'], kind='stable', ignore_index=True
+    )
+
+
+def write_conflict_report(conflicts, path):
+    conflicts.to_csv(path, index=False, encoding='utf-8-sig')
+
+
+def summarize_conflicts(conflicts):
+    """按资源类型统计冲突数，例如 "教室 3 处，教师 0 处，教学班 1 处" """
+    counts = conflicts['资源类型'].value_counts()
+    return '，'.join(f"{kind} {counts.get(kind, 0)} 处" for kind in RESOURCE_COLUMNS)
+
+
+# ===========================================
+# 单独运行
+# ===========================================
+if __name__ == '__main__':
+    lessons_path = sys.argv[1] if len(sys.argv) > 1 else LESSONS_CSV
+    report_path = sys.argv[2] if len(sys.argv) > 2 else CONFLICT_REPORT_CSV
+
+    try:
+        lessons = pd.read_csv(lessons_path, dtype=str)
+    except FileNotFoundError:
+        sys.exit(f"❌ 未找到文件 `{lessons_path}`")
+
+    conflicts = find_conflicts(compile_lessons(lessons))
+    write_conflict_report(conflicts, report_path)
+    print(f"排课冲突：{summarize_conflicts(conflicts)}，报告已保存到 {report_path}")
@@ -0,0 +1,428 @@
+"""
+课程查询
+
+检索网页（course_search_webpage.py）和 HTTP 接口（lesson_api.py）共用的查询逻辑：
+- 加载课程数据、教室列表，并在数据文件变化后由后台线程重新加载
+- 把筛选条件规范化为 FilterState，filter_rows 是 (课程数据, 筛选条件) → 行号数组 的纯函数，结果可以在所有会话之间共享缓存
+- 查询空闲教室、渲染课表 HTML
+QueryCache 是带过期时间的 LRU 缓存，课程数据版本变化时自动清空。
+"""
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from hot_reload import HotReloader
+from lesson_schedule import (
+    MAX_PERIOD_BIT, PERIOD_MASK_COLUMN, WEEK_MASK_COLUMN, WEEKDAY_COLUMN,
+    build_week_index, compile_lessons, feather, load_compiled_lessons, to_mask,
+)
+from room_occupancy import build_occupancy, flatten_classrooms, free_room_mask
+from substring_index import build_substring_indexes, category_codes
+
+# 建立子串检索索引的文字列
+SEARCH_COLUMNS = ["课程名称", "授课教师", "上课地点"]
+
+# 查询结果中展示的列
+DISPLAY_COLUMNS = ["序号", "课程代码", "课程名称", "周次", "星期", "节次", "授课教师", "上课地点", "教学班", "备注"]
+
+# course: 课程 CSV；compiled: 爬虫生成的预编译课程文件，比 CSV 新时优先读取；classrooms: 教室列表
+DataPaths = namedtuple('DataPaths', ['course', 'compiled', 'classrooms'])
+DEFAULT_DATA_PATHS = DataPaths("lessons_list_dedup.csv", "lessons_list_dedup.feather", "classroom_list.txt")
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int32)
+
+
+# ===========================================
+# 课程数据
+# ===========================================
+class LessonDataset:
+    """预编译课程表及其周次索引、子串检索索引；只读，由所有会话共享"""
+
+    def __init__(self, df, version=None):
+        self.df = df
+        self.version = version  # 数据文件的版本标识，文件变化后不同
+        self.week_index = build_week_index(df[WEEK_MASK_COLUMN])
+        self.search_indexes = build_substring_indexes(df, SEARCH_COLUMNS)
+
+
+def dataset_memory_usage(dataset):
+    """各部分占用的字节数（含字符串本身）：课程表逐列统计，周次索引、各子串检索索引各算一项"""
+    usage = {f"列 {col}": int(nbytes) for col, nbytes in dataset.df.memory_usage(deep=True, index=False).items()}
+    usage["周次索引"] = sum(sys.getsizeof(rows) for rows in dataset.week_index.values())
+    for col, index in dataset.search_indexes.items():
+        usage[f"子串检索索引 {col}"] = index.memory_usage()
+    return usage
+
+
+# ===========================================
+# 数据加载
+# ===========================================
+class DataLoadError(Exception):
+    """数据文件缺失或格式不正确"""
+
+
+def load_classrooms_structured(path):
+    """
+    从 classroom_list.txt 读取，格式：主校区:教学楼:教101
+    返回 structured: {校区: {楼宇: [教室名1, 教室名2, ...]}}
+    """
+    try:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        raise DataLoadError(f"未找到文件 `{path}`")
+    
+    structured = {}
+    valid_count = 0
+
+    for line in lines:
+        # 去除首尾空白 + BOM
+        full_name = line.strip().lstrip('\ufeff')
+        if not full_name:
+            continue
+        
+        parts = full_name.split(":", 2)  # 最多分3段
+        if len(parts) < 3:
+            # 可选：打印警告（调试用）
+            # st.warning(f"⚠️ 跳过无效行: {full_name}")
+            continue
+        
+        campus, building, room = parts[0].strip(), parts[1].strip(), parts[2].strip()
+        if not (campus and building and room):
+            continue
+
+        if campus not in structured:
+            structured[campus] = {}
+        if building not in structured[campus]:
+            structured[campus][building] = set()
+        structured[campus][building].add(room)
+        valid_count += 1
+
+    if valid_count == 0:
+        raise DataLoadError(f"`{path}` 中没有有效数据。请确保每行格式为：`校区:楼宇:教室名`")
+
+    # 转为排序列表
+    for campus in structured:
+        for building in structured[campus]:
+            structured[campus][building] = sorted(structured[campus][building])
+        structured[campus] = dict(sorted(structured[campus].items()))
+    structured = dict(sorted(structured.items()))
+
+    return structured
+
+
+def compiled_data_is_fresh(paths):
+    """预编译文件存在、可读取，且不比课程 CSV 旧"""
+    if feather is None or not os.path.exists(paths.compiled):
+        return False
+    if not os.path.exists(paths.course):
+        return True
+    return os.path.getmtime(paths.compiled) >= os.path.getmtime(paths.course)
+
+
+def load_and_preprocess_data(paths, data_version):
+    """返回 LessonDataset（预编译课程表及其周次索引、子串检索索引）"""
+    if compiled_data_is_fresh(paths):
+        return LessonDataset(load_compiled_lessons(paths.compiled), data_version)
+
+    try:
+        df = pd.read_csv(paths.course, dtype=str)
+    except FileNotFoundError:
+        raise DataLoadError(f"未找到文件 `{paths.course}`")
+    
+    required_cols = ["序号", "课程代码", "课程名称", "周次", "星期", "节次", "授课教师", "上课地点"]
+    missing = [col for col in required_cols if col not in df.columns]
+    if missing:
+        raise DataLoadError(f"CSV 缺少必要列: {missing}")
+    
+    return LessonDataset(compile_lessons(df), data_version)
+
+
+# version: 数据文件版本；dataset: LessonDataset；classrooms: {校区: {楼宇: [教室名, ...]}}；
+# rooms: [(校区, 楼宇, 教室名), ...]；occupancy: 教室 × 星期 × 节次 的周次位掩码占用表（用于查询空闲教室）
+AppData = namedtuple("AppData", ["version", "dataset", "classrooms", "rooms", "occupancy"])
+
+
+def load_app_data(paths, data_version):
+    """加载查询需要的全部数据，完成后才会替换正在使用的旧数据"""
+    dataset = load_and_preprocess_data(paths, data_version)
+    classrooms = load_classrooms_structured(paths.classrooms)
+    rooms = flatten_classrooms(classrooms)
+    occupancy = build_occupancy(dataset.df, [room for _, _, room in rooms])
+    return AppData(data_version, dataset, classrooms, rooms, occupancy)
+
+
+
+def start_data_reloader(paths=DEFAULT_DATA_PATHS, interval=5):
+    """加载数据并启动后台检查线程，返回的 HotReloader.current 始终是完整的 AppData"""
+    return HotReloader(list(paths), partial(load_app_data, paths), interval).start()
+
+
+# ===========================================
+# 筛选条件
+# ===========================================
+# week: 周次；course_name / teacher_name / location: 小写的模糊搜索文字；
+# periods: 升序的节次元组；weekdays: 升序的星期列号元组（0 为星期日）；room: 精确匹配的教室名
+FilterState = namedtuple('FilterState', ['week', 'course_name', 'teacher_name', 'periods', 'weekdays', 'location', 'room'])
+
+
+def normalize_filter_state(week, course_name="", teacher_name="", periods=(), weekdays=(), location="", room=""):
+    """
+    把界面上的原始输入整理为 FilterState，含义相同的输入得到相同的结果：
+    文字统一小写（检索本就不区分大小写），节次、星期去重排序，填写了手动输入的地点时忽略所选教室
+    """
+    location = location.strip().lower()
+    return FilterState(
+        week=int(week),
+        course_name=course_name.lower(),
+        teacher_name=teacher_name.lower(),
+        periods=tuple(sorted({int(p) for p in periods})),
+        weekdays=tuple(sorted({int(d) for d in weekdays})),
+        location=location,
+        room="" if location else room,
+    )
+
+
+def filter_rows(dataset, state):
+    """返回满足筛选条件的行号数组（升序、只读）"""
+    df = dataset.df
+    # 周次：直接取周次索引中该周的行号，之后的筛选只在这些行上进行
+    week_rows = dataset.week_index.get(state.week, _EMPTY_ROWS)
+
+    # 节次、星期直接对预编译的整数列做位运算，文字条件通过子串检索索引得到匹配的 category 编码，
+    # 全部合成一个布尔掩码后只选取一次行
+    row_mask = np.ones(len(week_rows), dtype=bool)
+
+    def contains_mask(col, query):
+        """该周各行的 col 列是否包含 query（按普通文字匹配，不区分大小写）"""
+        return dataset.search_indexes[col].match_mask(query)[category_codes(df, col)[week_rows]]
+
+    if state.periods:
+        selected_period_mask = to_mask(state.periods, MAX_PERIOD_BIT)
+        row_mask &= (df[PERIOD_MASK_COLUMN].to_numpy()[week_rows] & selected_period_mask) != 0
+    if state.weekdays:
+        row_mask &= np.isin(df[WEEKDAY_COLUMN].to_numpy()[week_rows], state.weekdays)
+    if state.course_name:
+        row_mask &= contains_mask('课程名称', state.course_name)
+    if state.teacher_name:
+        row_mask &= contains_mask('授课教师', state.teacher_name)
+
+    # 上课地点：手动输入时模糊匹配，否则按所选教室精确匹配（比较 category 编码，教室不在数据中时编码为 -1）
+    if state.location:
+        row_mask &= contains_mask('上课地点', state.location)
+    elif state.room:
+        room_code = df['上课地点'].cat.categories.get_indexer([state.room])[0]
+        row_mask &= category_codes(df, '上课地点')[week_rows] == room_code
+
+    rows = week_rows[row_mask]
+    rows.flags.writeable = False
+    return rows
+
+
+# ===========================================
+# 查询结果
+# ===========================================
+def lesson_records(df, rows):
+    """把行号数组对应的课程转为 [{列名: 值}, ...]，只包含 DISPLAY_COLUMNS 中存在的列"""
+    columns = [col for col in DISPLAY_COLUMNS if col in df.columns]
+    return df.iloc[rows][columns].astype(str).to_dict('records')
+
+
+def find_free_rooms(app_data, week, weekdays=(), periods=(), campus="", building=""):
+    """
+    第 week 周所选星期、节次（为空时分别为整周、全部节次）中都没有课的教室，可按校区、楼宇缩小范围
+    返回列为 校区、楼宇、教室 的 DataFrame
+    """
+    free = free_room_mask(app_data.occupancy, [int(week)], [int(d) for d in weekdays], [int(p) for p in periods])
+    free_rooms = pd.DataFrame(
+        [room for room, is_free in zip(app_data.rooms, free) if is_free],
+        columns=["校区", "楼宇", "教室"]
+    )
+    if campus:
+        free_rooms = free_rooms[free_rooms["校区"] == campus]
+    if building:
+        free_rooms = free_rooms[free_rooms["楼宇"] == building]
+    return free_rooms
+
+
+# ===========================================
+# 课表 HTML
+# ===========================================
+TIMETABLE_PERIODS = 12  # 课表显示的节次数
+TIMETABLE_MAX_COURSES = 2  # 每个格子最多显示的课程数，超出部分显示为 "..."
+
+TIMETABLE_STYLE = """
+    <style>
+    .timetable {
+        width: 100%;
+        border-collapse: collapse;
+        font-size: 12px;
+        table-layout: fixed;
+    }
+    .timetable th,
+    .timetable td {
+        border: 1px solid #ccc;
+        padding: 6px;
+        text-align: center;
+        vertical-align: top;
+        height: 60px;
+        word-wrap: break-word;
+    }
+    .timetable th {
+        background-color: #e0e0e0;
+        color: white;
+        font-weight: bold;
+    }
+    .has-course {
+        background-color: #1E90FF;
+        color: white;
+        font-weight: bold;
+    }
+    </style>
+    <table class="timetable">
+      <thead>
+        <tr>
+          <th>节次</th>
+          <th>星期日</th>
+          <th>星期一</th>
+          <th>星期二</th>
+          <th>星期三</th>
+          <th>星期四</th>
+          <th>星期五</th>
+          <th>星期六</th>
+        </tr>
+      </thead>
+      <tbody>
+    """
+
+
+def build_timetable_grid(filtered_df):
+    """
+    用预编译的星期列号和节次位掩码一次性把课程放进 12×7 的格子
+    返回 (每格课程数, 每格前 TIMETABLE_MAX_COURSES 门课程名)，格子按 节次 * 7 + 星期 编号，格内保持行的原有顺序
+    """
+    cell_count = TIMETABLE_PERIODS * 7
+    weekdays = filtered_df[WEEKDAY_COLUMN].to_numpy()
+    periods = filtered_df[PERIOD_MASK_COLUMN].to_numpy()
+    names = filtered_df["课程名称"].astype(str).to_numpy()
+
+    # occupied[i, p] 表示第 i 行第 p + 1 节有课；星期无法识别的行不显示
+    occupied = ((periods[:, None] >> np.arange(1, TIMETABLE_PERIODS + 1)) & 1).astype(bool)
+    occupied[weekdays < 0] = False
+    row_idx, period_idx = np.nonzero(occupied)
+    cells = period_idx * 7 + weekdays[row_idx]
+
+    # 按格子稳定排序后，每门课在格内的序号 = 位置 - 该格起点
+    order = np.argsort(cells, kind="stable")
+    cells, row_idx = cells[order], row_idx[order]
+    counts = np.bincount(cells, minlength=cell_count)
+    rank = np.arange(len(cells)) - (np.cumsum(counts) - counts)[cells]
+    shown = rank < TIMETABLE_MAX_COURSES
+
+    grid = [[] for _ in range(cell_count)]
+    for cell, name in zip(cells[shown].tolist(), names[row_idx[shown]].tolist()):
+        grid[cell].append(name)
+    return counts, grid
+
+
+def render_timetable(filtered_df):
+    counts, grid = build_timetable_grid(filtered_df)
+
+    parts = [TIMETABLE_STYLE]
+    for i in range(TIMETABLE_PERIODS):
+        parts.append(f"<tr><td>{i + 1}</td>")
+        for j in range(7):
+            cell = i * 7 + j
+            if counts[cell]:
+                display_text = "<br>".join(grid[cell])
+                if counts[cell] > TIMETABLE_MAX_COURSES:
+                    display_text += "<br>..."
+                parts.append(f'<td class="has-course">{display_text}</td>')
+            else:
+                parts.append("<td></td>")
+        parts.append("</tr>")
+
+    parts.append("</tbody></table>")
+    return "".join(parts)
+
+
+# ===========================================
+# 查询缓存
+# ===========================================
+class QueryCache:
+    """
+    线程安全的 LRU 缓存，最多保存 maxsize 条，每条在 ttl 秒后过期
+    给出 maxbytes 时还按 sizeof(值) 之和限制总大小，超过时淘汰最久未用的条目，单个超过 maxbytes 的值不缓存
+    取值时传入数据版本，版本与缓存中的不同时先清空全部条目
+    """
+
+    def __init__(self, maxsize=256, ttl=600, maxbytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key → (写入时间, 值, 大小)
+        self._bytes = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def get_or_compute(self, version, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        # 计算时不持有锁，不同查询可以同时计算
+        value = compute()
+        size = self.sizeof(value)
+        if self.maxbytes is not None and size > self.maxbytes:
+            return value
+        with self._lock:
+            if version == self._version:
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[2]
+                self._entries[key] = (now, value, size)
+                self._bytes += size
+                while len(self._entries) > self.maxsize or (self.maxbytes is not None and self._bytes > self.maxbytes):
+                    self._bytes -= self._entries.popitem(last=False)[1][2]
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'bytes': self._bytes,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
+
+
+def cached_filter_rows(cache, dataset, state):
+    """带缓存的 filter_rows，缓存键为规范化后的筛选条件"""
+    return cache.get_or_compute(dataset.version, state, lambda: filter_rows(dataset, state))
@@ -0,0 +1,181 @@
+"""
+课程时间解析与预编译数据文件
+
+爬虫和检索网页共用这里的周次/节次/星期/教室解析逻辑。
+爬虫在生成去重课程 CSV 后，额外输出一份 Feather（Arrow）格式的预编译文件：
+- 文字列按字典编码（pandas 中为 category 类型）存储
+- 周次、节次解析为整数位掩码，星期解析为 0~6 的列号
+检索网页启动时以内存映射方式读取该文件，无需再逐行解析 CSV：位掩码和星期列直接引用映射的文件内容，
+文字列的字典仍需解码为 pandas 的 category。
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+# 预编译列
+WEEK_MASK_COLUMN = '_week_mask'  # 第 w 周上课则第 w 位为 1（int64，支持 1~62 周）
+PERIOD_MASK_COLUMN = '_period_mask'  # 第 p 节上课则第 p 位为 1（int32，支持 1~30 节）
+WEEKDAY_COLUMN = '_weekday'  # 星期日~星期六 对应 0~6，无法识别为 -1（int8）
+
+MAX_WEEK_BIT = 62
+MAX_PERIOD_BIT = 30
+
+WEEKDAY_TO_COL = {"日": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6}
+
+
+# ===========================================
+# 工具函数（周次、节次、星期、教室）
+# ===========================================
+def parse_weeks(week_str):
+    if not week_str or str(week_str).strip().lower() in ("null", "", "无"):
+        return set()
+    weeks = set()
+    normalized = str(week_str).replace('；', ';').replace(';', ',')
+    parts = [p.strip() for p in normalized.split(',') if p.strip()]
+    range_pattern = re.compile(r'^\[(\d+)-(\d+)\](.*)$')
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        match = range_pattern.match(part)
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2))
+            suffix = match.group(3).strip()
+            week_range = list(range(start, end + 1))
+            if '单' in suffix:
+                selected = [w for w in week_range if w % 2 == 1]
+            elif '双' in suffix:
+                selected = [w for w in week_range if w % 2 == 0]
+            else:
+                selected = week_range
+            weeks.update(selected)
+        elif part.isdigit():
+            weeks.add(int(part))
+    return weeks
+
+def extract_periods(period_str):
+    if not isinstance(period_str, str) or period_str.strip().lower() in ("null", "", "无"):
+        return set()
+    match = re.search(r'\[(\d+)-(\d+)\]', period_str.strip())
+    if match:
+        a, b = int(match.group(1)), int(match.group(2))
+        if a <= b:
+            return set(range(a, b + 1))
+    return set()
+
+def normalize_weekday(raw):
+    if pd.isna(raw) or str(raw).strip().lower() in ("null", "", "无"):
+        return None
+    s = str(raw).strip()
+    mapping = {
+        "星期日": "日",
+        "星期一": "一",
+        "星期二": "二",
+        "星期三": "三",
+        "星期四": "四",
+        "星期五": "五",
+        "星期六": "六"
+    }
+    return mapping.get(s)
+
+def split_classrooms(location):
+    """把上课地点拆分为教室名列表：按逗号分割（支持“a,b,c”形式），去除星号和首尾空白，忽略空字符串"""
+    classrooms = []
+    for part in location.split(','):
+        cleaned = part.replace('*', '').strip()
+        if cleaned:
+            classrooms.append(cleaned)
+    return classrooms
+
+
+# ===========================================
+# 位掩码编码
+# ===========================================
+def to_mask(numbers, max_bit):
+    """把整数集合编码为位掩码，超出 1~max_bit 的值被忽略"""
+    mask = 0
+    for n in numbers:
+        if 1 <= n <= max_bit:
+            mask |= 1 << n
+    return mask
+
+def from_mask(mask, max_bit):
+    """to_mask 的逆运算：位掩码 → 升序的整数列表"""
+    return [n for n in range(1, max_bit + 1) if mask >> n & 1]
+
+def week_mask(week_str):
+    return to_mask(parse_weeks(week_str), MAX_WEEK_BIT)
+
+def period_mask(period_str):
+    return to_mask(extract_periods(period_str), MAX_PERIOD_BIT)
+
+def weekday_index(raw):
+    weekday_norm = normalize_weekday(raw)
+    return -1 if weekday_norm is None else WEEKDAY_TO_COL[weekday_norm]
+
+
+def _map_unique(series, func):
+    """同一取值只解析一次：先对去重后的取值求结果，再映射回每一行"""
+    uniques = series.unique()
+    return series.map(dict(zip(uniques, (func(v) for v in uniques))))
+
+
+# ===========================================
+# 预编译课程表
+# ===========================================
+def compile_lessons(df):
+    """
+    输入全部为字符串的课程表（空值为 NaN 或空字符串），返回预编译后的课程表：
+    空值统一为 "null"，文字列转为 category，并追加周次/节次位掩码和星期列号
+    """
+    df = df.fillna("null").replace("", "null")
+    compiled = df.astype("category")
+    compiled[WEEK_MASK_COLUMN] = _map_unique(df['周次'], week_mask).astype('int64')
+    compiled[PERIOD_MASK_COLUMN] = _map_unique(df['节次'], period_mask).astype('int32')
+    compiled[WEEKDAY_COLUMN] = _map_unique(df['星期'], weekday_index).astype('int8')
+    return compiled
+
+def build_week_index(week_masks):
+    """
+    周次 → 该周有课的行号数组（升序，int32），只为实际出现过的周次建立条目
+    翻到某一周时直接从对应的行开始筛选，不必扫描整张表
+    """
+    week_masks = np.asarray(week_masks, dtype=np.int64)
+    present = int(np.bitwise_or.reduce(week_masks)) if len(week_masks) else 0
+    index = {}
+    for week in range(1, MAX_WEEK_BIT + 1):
+        if present >> week & 1:
+            index[week] = np.flatnonzero(week_masks & (1 << week)).astype(np.int32)
+    return index
+
+def write_compiled_lessons(compiled, path):
+    """
+    以不压缩的 Feather 格式写出，读取时可以直接内存映射
+    整张表写成一个分块：每列在文件中连续存放，读取时数值列才能不经拷贝直接使用（多个分块需要先拼接）
+    先写入临时文件再替换，正在运行的检索网页不会读到写了一半的文件
+    """
+    if feather is None:
+        raise ImportError("未安装 pyarrow，无法生成预编译课程文件，请先运行 pip install pyarrow")
+    tmp_path = path + '.tmp'
+    feather.write_feather(
+        compiled.reset_index(drop=True), tmp_path, compression='uncompressed', chunksize=max(len(compiled), 1)
+    )
+    os.replace(tmp_path, path)
+
+def load_compiled_lessons(path):
+    """
+    以内存映射方式读取预编译课程文件
+    周次/节次位掩码和星期列是映射内存上的只读视图，不占用额外内存；category 列的字典和编码仍会解码、复制到 pandas 中
+    split_blocks 使各列各自成块，避免合并为二维块时的拷贝；self_destruct 在转换过程中逐列释放 Arrow 表
+    """
+    if feather is None:
+        raise ImportError("未安装 pyarrow，无法读取预编译课程文件，请先运行 pip install pyarrow")
+    return feather.read_table(path, memory_map=True).to_pandas(split_blocks=True, self_destruct=True)
@@ -0,0 +1,61 @@
+"""
+内存占用报告
+
+用法：python memory_report.py [课程CSV]
+对比同一份课程数据在两种表示方式下占用的内存：
+- 字符串表示：全部列为字符串（object），并为每行保存一个解析后的周次集合（早期检索网页的做法）
+- 预编译表示：文字列为 category，周次/节次/星期为整数位掩码和列号，外加检索网页使用的周次索引、子串检索索引和教室占用表
+"""
+import sys
+
+import pandas as pd
+
+from lesson_query import LessonDataset, dataset_memory_usage
+from lesson_schedule import compile_lessons, parse_weeks, split_classrooms
+from room_occupancy import build_occupancy
+
+LESSONS_CSV = 'lessons_list_dedup.csv'
+
+
+def format_bytes(nbytes):
+    for unit in ('B', 'KB', 'MB'):
+        if nbytes < 1024:
+            return f"{nbytes:.1f} {unit}"
+        nbytes /= 1024
+    return f"{nbytes:.1f} GB"
+
+
+def string_frame_memory_usage(df):
+    """字符串表示：各列（含字符串本身）加上每行一个周次集合"""
+    usage = {f"列 {col}": int(nbytes) for col, nbytes in df.memory_usage(deep=True, index=False).items()}
+    usage["周次集合"] = sum(
+        sys.getsizeof(weeks) + sum(sys.getsizeof(w) for w in weeks)
+        for weeks in df['周次'].map(parse_weeks)
+    )
+    return usage
+
+
+def print_usage(title, usage):
+    total = sum(usage.values())
+    print(f"\n{title}：共 {format_bytes(total)}")
+    for name, nbytes in sorted(usage.items(), key=lambda item: -item[1]):
+        print(f"  {name:<24}{format_bytes(nbytes):>12}")
+    return total
+
+
+if __name__ == '__main__':
+    lessons_path = sys.argv[1] if len(sys.argv) > 1 else LESSONS_CSV
+    try:
+        raw = pd.read_csv(lessons_path, dtype=str)
+    except FileNotFoundError:
+        sys.exit(f"❌ 未找到文件 `{lessons_path}`")
+
+    dataset = LessonDataset(compile_lessons(raw))
+    compiled_usage = dataset_memory_usage(dataset)
+    rooms = sorted({room for location in dataset.df['上课地点'].cat.categories for room in split_classrooms(str(location))})
+    compiled_usage["教室占用表"] = build_occupancy(dataset.df, rooms).nbytes
+
+    print(f"课程数据 {lessons_path}：{len(raw)} 行")
+    before = print_usage("字符串表示", string_frame_memory_usage(raw))
+    after = print_usage("预编译表示（含索引）", compiled_usage)
+    print(f"\n预编译表示占用为字符串表示的 {after / before:.1%}")
@@ -0,0 +1,142 @@
+"""
+页面耗时统计
+
+RerunTimer 记录一次页面重新运行中各阶段的耗时：在每个阶段结束处调用 lap(阶段名)，
+得到的是与上一次 lap 之间的时间，不必把各阶段的代码包进 with 语句。
+TimingStats 由所有会话共享，汇总每个阶段的耗时直方图、最近的耗时样本（用于计算分位数）和最慢的若干次运行，
+并可把每次运行的明细追加到 JSON Lines 日志中。
+"""
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 直方图各桶的上界（毫秒），最后一个桶收集更慢的运行
+HISTOGRAM_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+TOTAL_STAGE = "总计"
+
+
+class RerunTimer:
+    """一次页面运行的分阶段计时；同名阶段多次出现时耗时累加"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.stages = {}  # 阶段名 → 毫秒，按出现顺序
+        self.info = {}  # 附加信息，如检索模式、结果行数，随明细一起记录
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def record(self):
+        """本次运行的明细：{time, total_ms, stages: {阶段: 毫秒}, ...info}"""
+        return dict(
+            self.info,
+            time=round(time.time(), 3),
+            total_ms=round((self._last - self.started) * 1000, 3),
+            stages={stage: round(ms, 3) for stage, ms in self.stages.items()},
+        )
+
+
+class TimingStats:
+    """
+    线程安全，所有会话共享：
+    - 每个阶段（以及总耗时）的直方图、次数、总耗时和最大值，从启动起累计
+    - 每个阶段最近 recent 个样本，用于计算 p50 / p95
+    - 总耗时最长的 slowest 次运行的明细
+    log_path 不为 None 时，每次运行的明细追加一行 JSON 到该文件
+    """
+
+    def __init__(self, recent=1000, slowest=20, log_path=None):
+        self.recent = recent
+        self.slowest_size = slowest
+        self.log_path = log_path
+        self.reruns = 0
+        self._stages = {}  # 阶段 → {'count', 'sum_ms', 'max_ms', 'buckets', 'samples'}
+        self._slowest = []  # (总耗时, 序号, 明细) 的小顶堆
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _stage(self, stage):
+        entry = self._stages.get(stage)
+        if entry is None:
+            entry = self._stages[stage] = {
+                'count': 0, 'sum_ms': 0.0, 'max_ms': 0.0,
+                'buckets': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1),
+                'samples': deque(maxlen=self.recent),
+            }
+        return entry
+
+    def add(self, record):
+        samples = dict(record['stages'])
+        samples[TOTAL_STAGE] = record['total_ms']
+        with self._lock:
+            self.reruns += 1
+            for stage, ms in samples.items():
+                entry = self._stage(stage)
+                entry['count'] += 1
+                entry['sum_ms'] += ms
+                entry['max_ms'] = max(entry['max_ms'], ms)
+                entry['buckets'][int(np.searchsorted(HISTOGRAM_BUCKETS_MS, ms))] += 1
+                entry['samples'].append(ms)
+
+            item = (record['total_ms'], next(self._seq), record)
+            if len(self._slowest) < self.slowest_size:
+                heapq.heappush(self._slowest, item)
+            elif item[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+            if self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def summary(self):
+        """[{阶段, 次数, 平均, p50, p95, 最大（毫秒）}, ...]，按平均耗时从高到低"""
+        with self._lock:
+            rows = []
+            for stage, entry in self._stages.items():
+                samples = np.fromiter(entry['samples'], dtype=float)
+                rows.append({
+                    '阶段': stage,
+                    '次数': entry['count'],
+                    '平均 ms': round(entry['sum_ms'] / entry['count'], 2),
+                    'p50 ms': round(float(np.percentile(samples, 50)), 2),
+                    'p95 ms': round(float(np.percentile(samples, 95)), 2),
+                    '最大 ms': round(entry['max_ms'], 2),
+                })
+        return sorted(rows, key=lambda row: -row['平均 ms'])
+
+    def histogram(self, stage):
+        """{桶标签: 次数}，如 {'≤1ms': 3, ..., '>5000ms': 0}"""
+        labels = [f'≤{bound}ms' for bound in HISTOGRAM_BUCKETS_MS] + [f'>{HISTOGRAM_BUCKETS_MS[-1]}ms']
+        with self._lock:
+            entry = self._stages.get(stage)
+            counts = list(entry['buckets']) if entry else [0] * len(labels)
+        return dict(zip(labels, counts))
+
+    def stages(self):
+        with self._lock:
+            return list(self._stages)
+
+    def slowest(self):
+        """最慢的若干次运行的明细，从慢到快"""
+        with self._lock:
+            return [record for _, _, record in sorted(self._slowest, key=lambda item: -item[0])]
+
+    def export(self):
+        """全部统计结果（可序列化为 JSON），用于下载或存档"""
+        return {
+            'reruns': self.reruns,
+            'buckets_ms': list(HISTOGRAM_BUCKETS_MS),
+            'stages': {
+                row['阶段']: dict(row, histogram=list(self.histogram(row['阶段']).values()))
+                for row in self.summary()
+            },
+            'slowest': self.slowest(),
+        }
@@ -0,0 +1,79 @@
+"""
+教室占用表
+
+以 教室 × 星期 × 节次 为下标、以周次位掩码为值，预先汇总所有课程对教室的占用：
+occupancy[r, d, p] 的第 w 位为 1 表示第 r 个教室在第 w 周星期 d（0 为星期日）第 p 节有课。
+“第 7 周星期二第 3-4 节哪些教室空闲”这类查询只需对所有教室做一次按位或归约，不必逐个教室查看课表。
+星期无法识别的课程不计入占用。
+"""
+import numpy as np
+
+from lesson_schedule import (
+    MAX_PERIOD_BIT, MAX_WEEK_BIT, PERIOD_MASK_COLUMN, WEEK_MASK_COLUMN, WEEKDAY_COLUMN, split_classrooms, to_mask,
+)
+
+WEEKDAYS = list(range(7))
+PERIODS = list(range(1, MAX_PERIOD_BIT + 1))
+
+
+def flatten_classrooms(structured):
+    """{校区: {楼宇: [教室名, ...]}} → [(校区, 楼宇, 教室名), ...]，顺序即占用表中教室的下标"""
+    return [
+        (campus, building, room)
+        for campus, buildings in structured.items()
+        for building, rooms in buildings.items()
+        for room in rooms
+    ]
+
+
+def build_occupancy(df, room_names):
+    """
+    根据预编译课程表计算占用表，返回形状为 (教室数, 7, 最大节次 + 1) 的 int64 数组，
+    节次维只保留到课程中实际出现的最大节次（通常为 12 左右），不按 MAX_PERIOD_BIT 分配
+    课程按上课地点中的教室名与 room_names 对应，同名教室（不同楼宇）都会被计为占用
+    """
+    room_ids = {}
+    for room_id, room in enumerate(room_names):
+        room_ids.setdefault(room, []).append(room_id)
+    all_periods = int(np.bitwise_or.reduce(df[PERIOD_MASK_COLUMN].to_numpy())) if len(df) else 0
+    occupancy = np.zeros((len(room_names), 7, max(all_periods.bit_length(), 1)), dtype=np.int64)
+
+    # 同一上课地点只拆分一次，再按 category 编码展开为 (行, 教室) 对
+    locations = df['上课地点'].cat.categories
+    location_rooms = [
+        [room_id for room in split_classrooms(str(location)) for room_id in room_ids.get(room, ())]
+        for location in locations
+    ]
+    rooms_per_location = np.array([len(ids) for ids in location_rooms], dtype=np.int64)
+    flat_rooms = np.array([room_id for ids in location_rooms for room_id in ids], dtype=np.int64)
+    location_start = np.cumsum(rooms_per_location) - rooms_per_location
+
+    codes = df['上课地点'].cat.codes.to_numpy()
+    weekdays = df[WEEKDAY_COLUMN].to_numpy()
+    rows = np.flatnonzero((weekdays >= 0) & (df[WEEK_MASK_COLUMN].to_numpy() != 0) & (codes >= 0))
+    counts = rooms_per_location[codes[rows]]
+    pair_rows = np.repeat(rows, counts)
+    # 每一对在所属行内的序号，加上该上课地点在 flat_rooms 中的起点即为教室下标
+    offset_in_row = np.arange(len(pair_rows)) - np.repeat(np.cumsum(counts) - counts, counts)
+    pair_rooms = flat_rooms[location_start[codes[pair_rows]] + offset_in_row]
+
+    pair_weekdays = weekdays[pair_rows].astype(np.int64)
+    pair_weeks = df[WEEK_MASK_COLUMN].to_numpy()[pair_rows]
+    pair_periods = df[PERIOD_MASK_COLUMN].to_numpy()[pair_rows]
+    for period in range(1, occupancy.shape[2]):
+        selected = (pair_periods >> period & 1).astype(bool)
+        np.bitwise_or.at(occupancy, (pair_rooms[selected], pair_weekdays[selected], period), pair_weeks[selected])
+    return occupancy
+
+
+def free_room_mask(occupancy, weeks, weekdays=None, periods=None):
+    """
+    各教室在给定周次、星期、节次的所有组合中是否都没有课，返回长度为教室数的布尔数组
+    weekdays 为 0~6 的列号，periods 为节次；为空时分别表示一周七天、全部节次
+    """
+    week_bits = to_mask(weeks, MAX_WEEK_BIT)
+    weekdays = sorted(weekdays) if weekdays else WEEKDAYS
+    # 超出占用表节次维的节次没有任何课程；小于 1 的节次同样忽略，否则负数会被 numpy 当作从末尾数起的下标
+    periods = [p for p in (sorted(periods) if periods else PERIODS) if 1 <= p < occupancy.shape[2]]
+    slots = occupancy[:, weekdays][:, :, periods].reshape(len(occupancy), -1)
+    return (np.bitwise_or.reduce(slots, axis=1) & week_bits) == 0
@@ -0,0 +1,246 @@
+"""
+检索网页性能测试
+
+对一份课程数据（默认为 synthetic_data.py 生成的合成数据）测量检索网页的主要开销：
+- 冷加载：load_app_data 从 CSV 加载（含解析周次/节次、建立索引和教室占用表）的耗时；安装了 pyarrow 时另测从预编译文件加载
+- 各种筛选：filter_rows 在课程最多的一周上分别按节次、星期、课程名、教师、地点、教室筛选的 p50 / p99 耗时，以及空闲教室查询
+- 最坏情况的课表渲染：不加任何筛选、课程最多的一周整周渲染 render_timetable 的耗时
+- 峰值内存：从 CSV 加载期间 Python / NumPy 分配的内存峰值（tracemalloc 统计，不含 pyarrow 内存池），以及加载完成后数据的常驻大小
+
+用法：python search_benchmark.py [--rows 100k] [--data-dir 目录] [--repeat 50] [--json 结果.json]
+                                [--baseline 上次结果.json] [--tolerance 0.25]
+不指定 --data-dir 时在临时目录中生成 --rows 行合成数据，测试结束后删除；指定了但目录中没有数据时在该目录中生成并保留。
+给出 --baseline 时与上次的结果逐项对比，任何加载耗时、p50 耗时或内存指标变差超过 --tolerance（比例）即以退出码 1 结束，可用于拦截性能退化。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from lesson_query import (
+    DataPaths, dataset_memory_usage, filter_rows, find_free_rooms, load_app_data, normalize_filter_state,
+    render_timetable,
+)
+from lesson_schedule import feather, write_compiled_lessons
+from synthetic_data import parse_row_count, write_dataset
+
+# 对比基线的指标及其最小变化量，小于该值的变化视为计时抖动；p99 受偶发停顿影响较大，只报告不对比
+REGRESSION_MIN_DELTA = {'p50_ms': 0.5, '_seconds': 0.05, '_mb': 1.0}
+
+
+def timed(func, repeat):
+    """运行 repeat 次，返回 (各次耗时毫秒数组, 最后一次的返回值)"""
+    durations = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return np.array(durations), result
+
+
+def latency_summary(durations):
+    return {
+        'p50_ms': round(float(np.percentile(durations, 50)), 3),
+        'p99_ms': round(float(np.percentile(durations, 99)), 3),
+    }
+
+
+def most_common(values):
+    values = [v for v in values if v and v != 'null']
+    uniques, counts = np.unique(values, return_counts=True)
+    return str(uniques[np.argmax(counts)])
+
+
+# ===========================================
+# 各项测试
+# ===========================================
+def bench_cold_load(paths, repeat):
+    """从 CSV 和预编译文件加载的耗时（各 repeat 次取中位数），返回 (结果, 从 CSV 加载的 AppData)"""
+    csv_paths = paths._replace(compiled=paths.compiled + '.absent')
+    durations, app_data = timed(lambda: load_app_data(csv_paths, None), repeat)
+    result = {'csv_seconds': round(float(np.median(durations)) / 1000, 3)}
+
+    if feather is not None:
+        # 预编译文件写在临时目录中，不改动数据目录里已有的文件
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            compiled_paths = paths._replace(compiled=os.path.join(tmp_dir, os.path.basename(paths.compiled)))
+            write_compiled_lessons(app_data.dataset.df, compiled_paths.compiled)
+            durations, _ = timed(lambda: load_app_data(compiled_paths, None), repeat)
+            result['compiled_seconds'] = round(float(np.median(durations)) / 1000, 3)
+    return result, app_data
+
+
+def bench_peak_memory(paths, app_data):
+    csv_paths = paths._replace(compiled=paths.compiled + '.absent')
+    tracemalloc.start()
+    try:
+        load_app_data(csv_paths, None)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    resident = sum(dataset_memory_usage(app_data.dataset).values()) + app_data.occupancy.nbytes
+    return {
+        'load_peak_mb': round(peak / 2 ** 20, 1),
+        'resident_mb': round(resident / 2 ** 20, 1),
+    }
+
+
+def filter_cases(app_data, week):
+    """用数据中最常见的取值构造有代表性的筛选条件：名称 → FilterState"""
+    df = app_data.dataset.df
+    rows = app_data.dataset.week_index[week]
+    course = most_common(df['课程名称'].astype(str).to_numpy()[rows])
+    teacher = most_common(df['授课教师'].astype(str).to_numpy()[rows])
+    room = most_common(df['上课地点'].astype(str).to_numpy()[rows])
+    building = app_data.rooms[0][1] if app_data.rooms else room[:2]
+    return {
+        '仅周次': normalize_filter_state(week),
+        '节次': normalize_filter_state(week, periods=[3, 4]),
+        '星期': normalize_filter_state(week, weekdays=[1, 3]),
+        '课程名称': normalize_filter_state(week, course_name=course[:2]),
+        '授课教师': normalize_filter_state(week, teacher_name=teacher[:1]),
+        '地点模糊匹配': normalize_filter_state(week, location=building),
+        '教室精确匹配': normalize_filter_state(week, room=room),
+        '组合条件': normalize_filter_state(week, course_name=course[:2], periods=[1, 2, 3, 4], weekdays=[1, 2, 3, 4, 5]),
+    }
+
+
+def bench_filters(app_data, week, repeat):
+    results = {}
+    for name, state in filter_cases(app_data, week).items():
+        durations, rows = timed(lambda: filter_rows(app_data.dataset, state), repeat)
+        results[name] = dict(latency_summary(durations), rows=int(len(rows)))
+
+    durations, free_rooms = timed(lambda: find_free_rooms(app_data, week, [2], [3, 4]), repeat)
+    results['空闲教室'] = dict(latency_summary(durations), rows=int(len(free_rooms)))
+    return results
+
+
+def bench_render(app_data, week, repeat):
+    """最坏情况：不加筛选，整周所有课程一起渲染"""
+    df = app_data.dataset.df
+    filtered_df = df.iloc[filter_rows(app_data.dataset, normalize_filter_state(week))]
+    durations, _ = timed(lambda: render_timetable(filtered_df), repeat)
+    return dict(latency_summary(durations), week=week, rows=int(len(filtered_df)))
+
+
+def run_benchmark(paths, repeat, load_repeat):
+    started = time.perf_counter()
+    cold_load, app_data = bench_cold_load(paths, load_repeat)
+    week_index = app_data.dataset.week_index
+    busiest_week = max(week_index, key=lambda w: len(week_index[w]))
+    result = {
+        'data': {'course': os.path.abspath(paths.course), 'rows': len(app_data.dataset.df), 'rooms': len(app_data.rooms)},
+        'cold_load': cold_load,
+        'filters': bench_filters(app_data, busiest_week, repeat),
+        'render': bench_render(app_data, busiest_week, max(3, repeat // 5)),
+        'memory': bench_peak_memory(paths, app_data),
+    }
+    result['total_seconds'] = round(time.perf_counter() - started, 1)
+    return result
+
+
+# ===========================================
+# 报告与基线对比
+# ===========================================
+def print_report(result):
+    data = result['data']
+    print(f"课程数据 {data['course']}：{data['rows']} 行，{data['rooms']} 间教室")
+    load = result['cold_load']
+    print(f"\n冷加载：CSV {load['csv_seconds']:.3f} 秒" +
+          (f"，预编译文件 {load['compiled_seconds']:.3f} 秒" if 'compiled_seconds' in load else "（未安装 pyarrow，跳过预编译文件）"))
+
+    print(f"\n筛选（第 {result['render']['week']} 周）：")
+    for name, item in result['filters'].items():
+        print(f"  {name:<10}p50 {item['p50_ms']:>8.3f} ms   p99 {item['p99_ms']:>8.3f} ms   {item['rows']:>8} 行")
+
+    render = result['render']
+    print(f"\n整周课表渲染：{render['rows']} 门课，p50 {render['p50_ms']:.3f} ms，p99 {render['p99_ms']:.3f} ms")
+    memory = result['memory']
+    print(f"\n内存：加载峰值 {memory['load_peak_mb']:.1f} MB，常驻 {memory['resident_mb']:.1f} MB")
+
+
+def _metrics(result, prefix=''):
+    """展开为 {路径: 数值}，只保留 REGRESSION_MIN_DELTA 中的指标"""
+    metrics = {}
+    for key, value in result.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            metrics.update(_metrics(value, path + '.'))
+        elif any(key.endswith(suffix) for suffix in REGRESSION_MIN_DELTA) and key != 'total_seconds':
+            metrics[path] = value
+    return metrics
+
+
+def find_regressions(result, baseline, tolerance):
+    """返回 [(指标, 基线值, 本次值), ...]：比基线变差超过 tolerance 比例且超过最小变化量的指标"""
+    current = _metrics(result)
+    regressions = []
+    for path, old in _metrics(baseline).items():
+        new = current.get(path)
+        if new is None:
+            continue
+        min_delta = next(delta for suffix, delta in REGRESSION_MIN_DELTA.items() if path.endswith(suffix))
+        if new > old * (1 + tolerance) and new - old > min_delta:
+            regressions.append((path, old, new))
+    return regressions
+
+
+def benchmark_data_dir(data_dir, args):
+    """对 data_dir 中的数据运行测试，目录中没有数据时先生成 --rows 行合成数据"""
+    paths = DataPaths(
+        os.path.join(data_dir, 'lessons_list_dedup.csv'),
+        os.path.join(data_dir, 'lessons_list_dedup.feather'),
+        os.path.join(data_dir, 'classroom_list.txt'),
+    )
+    if not os.path.exists(paths.course):
+        rows = parse_row_count(args.rows)
+        print(f"在 {data_dir} 中生成 {rows} 行合成数据...")
+        paths = write_dataset(data_dir, rows, args.seed)
+    return run_benchmark(paths, args.repeat, args.load_repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检索网页性能测试')
+    parser.add_argument('--rows', default='100k', help='合成数据的行数，如 10k、100k、1m（默认 100k）')
+    parser.add_argument('--data-dir', help='课程数据所在目录（含 lessons_list_dedup.csv 和 classroom_list.txt）')
+    parser.add_argument('--seed', type=int, default=0, help='合成数据的随机种子')
+    parser.add_argument('--repeat', type=int, default=50, help='每种筛选重复的次数（默认 50）')
+    parser.add_argument('--load-repeat', type=int, default=3, help='冷加载重复的次数，取中位数（默认 3）')
+    parser.add_argument('--json', help='把结果写入该 JSON 文件')
+    parser.add_argument('--baseline', help='与该 JSON 文件中的上次结果对比')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='允许比基线变差的比例（默认 0.25）')
+    args = parser.parse_args()
+
+    if args.data_dir:
+        result = benchmark_data_dir(args.data_dir, args)
+    else:
+        # 临时生成的数据在测试结束后删除，1m 行时有数十 MB
+        with tempfile.TemporaryDirectory(prefix='search_benchmark_') as data_dir:
+            result = benchmark_data_dir(data_dir, args)
+    print_report(result)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = find_regressions(result, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ 有 {len(regressions)} 项指标比基线变差超过 {args.tolerance:.0%}：")
+            for path, old, new in regressions:
+                print(f"  {path}: {old} → {new}")
+            sys.exit(1)
+        print(f"\n✅ 与基线相比没有超过 {args.tolerance:.0%} 的退化")
+
+
+if __name__ == '__main__':
+    main()
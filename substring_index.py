@@ -0,0 +1,71 @@
+"""
+子串检索索引
+
+对课程名称、授课教师、上课地点这类重复度很高的文字列，只针对去重后的取值建立
+字符二元组（bigram）倒排索引。查询时先用查询串各个 bigram 的倒排表求交集得到候选取值，
+再逐个确认候选确实包含查询串，最后通过 category 编码映射回行。
+查询串按普通文字处理（不是正则表达式），不区分大小写。
+"""
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+_EMPTY_IDS = np.empty(0, dtype=np.int32)
+
+
+def _bigrams(text):
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class SubstringIndex:
+    """对一组取值（通常是 category 列的 categories）建立的 bigram 倒排索引"""
+
+    def __init__(self, values):
+        self.values = [str(v).lower() for v in values]
+        postings = defaultdict(list)
+        for value_id, value in enumerate(self.values):
+            for gram in _bigrams(value):
+                postings[gram].append(value_id)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def search(self, query):
+        """返回包含 query 的取值编号（升序数组）"""
+        query = query.lower()
+        if len(query) < 2:
+            # 单个字符没有 bigram 可用，直接在去重后的取值中查找
+            candidates = range(len(self.values))
+        else:
+            # 从最短的倒排表开始求交集，候选为空时提前结束
+            posting_lists = sorted((self._postings.get(gram, _EMPTY_IDS) for gram in _bigrams(query)), key=len)
+            candidates = posting_lists[0]
+            for ids in posting_lists[1:]:
+                if len(candidates) == 0:
+                    break
+                candidates = np.intersect1d(candidates, ids, assume_unique=True)
+        return np.array([i for i in candidates if query in self.values[i]], dtype=np.int32)
+
+    def match_mask(self, query):
+        """长度为取值个数的布尔数组，包含 query 的取值处为 True，可直接用 category 编码取值得到行掩码"""
+        mask = np.zeros(len(self.values), dtype=bool)
+        mask[self.search(query)] = True
+        return mask
+
+    def memory_usage(self):
+        """倒排表、bigram 字典和小写取值列表占用的字节数（近似值）"""
+        return (
+            sys.getsizeof(self._postings)
+            + sum(sys.getsizeof(gram) + sys.getsizeof(ids) for gram, ids in self._postings.items())
+            + sys.getsizeof(self.values)
+            + sum(sys.getsizeof(value) for value in self.values)
+        )
+
+
+def build_substring_indexes(df, columns):
+    """为 df 中的各个 category 列建立子串索引，返回 {列名: SubstringIndex}"""
+    return {col: SubstringIndex(df[col].cat.categories) for col in columns}
+
+
+def category_codes(df, col):
+    """category 列的整数编码数组，与 SubstringIndex.match_mask 的结果配合使用"""
+    return df[col].cat.codes.to_numpy()
@@ -0,0 +1,158 @@
+"""
+合成课程数据
+
+生成与爬虫输出格式相同的 lessons_list_dedup.csv 和 classroom_list.txt，用于在没有真实数据时测试检索网页和压测：
+周次、节次、星期、上课地点的写法与教务系统一致（如 “[1-16]”“[1-15]单”“[2-16]双,18”，“[3-4]”，“星期三”，“文管A101,文管A102”），
+常见取值出现得更多；教室、课程、教师的数量随行数增长。同样的行数和 --seed 每次生成的数据相同。
+
+用法：python synthetic_data.py [--rows 100k] [--out-dir synthetic_dataset] [--seed 0]
+行数可写作 10000、10k、1m 等。
+"""
+import argparse
+import csv
+import os
+
+import numpy as np
+import pandas as pd
+
+from fake_eams import (
+    CAMPUS_BUILDINGS, COURSE_CATEGORIES, COURSE_HEADERS, COURSE_LEVELS, COURSE_SUBJECTS, DEPARTMENTS, WEEKDAY_NAMES,
+)
+from lesson_query import DataPaths
+
+CAMPUSES = ['主校区', '东校区', '南校区']
+SURNAMES = list('王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈')
+GIVEN_NAME_CHARS = list('伟芳娜秀英敏静丽强磊军洋勇艳杰娟涛明超兰霞平刚桂华建国志红玉晓鹏辉文斌宇浩凯宁欣怡子涵佳琪雪梅')
+
+# 常见的周次、节次写法，其余取值随机生成
+COMMON_WEEKS = ['[1-16]', '[1-8]', '[9-16]', '[1-15]单', '[2-16]双', '[1-17]', '[3-18]', '[1-12]', '[5-16]']
+COMMON_PERIODS = ['[1-2]', '[3-4]', '[5-6]', '[7-8]', '[9-10]', '[11-12]']
+OTHER_PERIODS = ['[1-3]', '[3-5]', '[6-8]', '[9-11]', '[1-4]', '[5-8]', '[10-12]']
+WEEKDAY_WEIGHTS = [0.02, 0.2, 0.2, 0.2, 0.2, 0.14, 0.04]  # 星期日~星期六
+
+
+def parse_row_count(text):
+    """'10000'、'10k'、'1m' → 行数"""
+    text = text.strip().lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _weighted(rng, common, other, common_share, size):
+    """以 common_share 的概率从 common 中取值，否则从 other 中取值"""
+    values = np.array(common + other, dtype=object)
+    use_common = rng.random(size) < common_share
+    picks = np.where(use_common, rng.integers(0, len(common), size), rng.integers(len(common), len(values), size))
+    return values[picks]
+
+
+def _week_strings():
+    weeks = []
+    for start in range(1, 11):
+        for end in range(start + 3, 21):
+            weeks.extend([f'[{start}-{end}]', f'[{start}-{end}]单', f'[{start}-{end}]双'])
+            if end <= 18:
+                weeks.append(f'[{start}-{end}],{end + 2}')
+    return weeks
+
+
+def _classrooms(rng, n_rooms):
+    """[(校区, 楼宇, 教室名), ...]，教室名形如 “文管A101”，同一楼宇只属于一个校区"""
+    buildings = [f'{name}{block}' for name in CAMPUS_BUILDINGS for block in 'ABCD']
+    rooms = set()
+    while len(rooms) < n_rooms:
+        building = buildings[rng.integers(len(buildings))]
+        rooms.add((building, f'{building}{rng.integers(1, 7)}{rng.integers(1, 31):02d}'))
+    return [(CAMPUSES[buildings.index(building) % len(CAMPUSES)], building, room) for building, room in sorted(rooms)]
+
+
+def generate_lessons(rows, seed=0):
+    """返回 (课程 DataFrame（全部为字符串，列同 lessons_list_dedup.csv）, [(校区, 楼宇, 教室名), ...])"""
+    rng = np.random.default_rng(seed)
+    n_rooms = int(np.clip(rows // 60, 50, 5000))
+    n_courses = int(np.clip(rows // 8, 50, 50000))
+    n_teachers = int(np.clip(rows // 6, 20, 200000))
+
+    classrooms = _classrooms(rng, n_rooms)
+    room_names = np.array([room for _, _, room in classrooms], dtype=object)
+
+    subjects = len(COURSE_SUBJECTS) * len(COURSE_LEVELS)
+    course_names = np.array([
+        COURSE_SUBJECTS[k % subjects // len(COURSE_LEVELS)] + COURSE_LEVELS[k % len(COURSE_LEVELS)]
+        + (str(k // subjects) if k >= subjects else '')
+        for k in range(n_courses)
+    ], dtype=object)
+    teacher_names = np.array([
+        SURNAMES[rng.integers(len(SURNAMES))] + ''.join(rng.choice(GIVEN_NAME_CHARS, rng.integers(1, 3)))
+        for _ in range(n_teachers)
+    ], dtype=object)
+
+    # 与爬虫的输出一样按教师排列，序号为该教师的第几门课
+    teacher = np.sort(rng.integers(0, n_teachers, rows))
+    course = rng.integers(0, n_courses, rows)
+    seq = pd.Series(teacher).groupby(teacher).cumcount().to_numpy() + 1
+
+    # 上课地点：多数为单个教室，少量为两个教室或带星号，极少数为空
+    location = room_names[rng.integers(0, n_rooms, rows)]
+    kind = rng.random(rows)
+    two_rooms = kind < 0.08
+    location[two_rooms] = location[two_rooms] + ',' + room_names[rng.integers(0, n_rooms, int(two_rooms.sum()))]
+    starred = (kind >= 0.08) & (kind < 0.11)
+    location[starred] = location[starred] + '*'
+    location[kind >= 0.99] = 'null'
+
+    df = pd.DataFrame({
+        '序号': seq.astype(str),
+        '课程序号': np.char.mod('%07d', np.arange(1, rows + 1)),
+        '课程代码': np.char.mod('C%05d', course),
+        '课程名称': course_names[course],
+        '课程类别': np.array(COURSE_CATEGORIES, dtype=object)[rng.integers(0, len(COURSE_CATEGORIES), rows)],
+        '教学班': np.char.mod('%d班', rng.integers(1, 400, rows)).astype(object),
+        '周课时': rng.choice(['2', '3', '4'], rows),
+        '学分': rng.choice(['1', '2', '3', '4'], rows),
+        '授课语言': '中文',
+        '上课人数': rng.integers(20, 180, rows).astype(str),
+        '是否排课': '是',
+        '周次': _weighted(rng, COMMON_WEEKS, _week_strings(), 0.7, rows),
+        '星期': np.array(WEEKDAY_NAMES, dtype=object)[rng.choice(7, rows, p=WEEKDAY_WEIGHTS)],
+        '节次': _weighted(rng, COMMON_PERIODS, OTHER_PERIODS, 0.85, rows),
+        '授课教师': teacher_names[teacher],
+        '上课地点': location,
+        '备注': np.where(rng.random(rows) < 0.9, 'null', '单双周交替'),
+    }, columns=COURSE_HEADERS)
+    df['教学班'] = np.array(DEPARTMENTS, dtype=object)[rng.integers(0, len(DEPARTMENTS), rows)] + df['教学班']
+    return df, classrooms
+
+
+def write_dataset(out_dir, rows, seed=0):
+    """在 out_dir 中写出 lessons_list_dedup.csv 和 classroom_list.txt，返回对应的 DataPaths"""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = DataPaths(
+        os.path.join(out_dir, 'lessons_list_dedup.csv'),
+        os.path.join(out_dir, 'lessons_list_dedup.feather'),
+        os.path.join(out_dir, 'classroom_list.txt'),
+    )
+    df, classrooms = generate_lessons(rows, seed)
+    df.to_csv(paths.course, index=False, encoding='utf-8-sig', quoting=csv.QUOTE_MINIMAL)
+    with open(paths.classrooms, 'w', encoding='utf-8-sig') as f:
+        f.writelines(f'{campus}:{building}:{room}\n' for campus, building, room in classrooms)
+    # 旧的预编译文件与新数据不对应
+    if os.path.exists(paths.compiled):
+        os.remove(paths.compiled)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成合成课程数据')
+    parser.add_argument('--rows', default='100k', help='课程行数，如 10k、100k、1m（默认 100k）')
+    parser.add_argument('--out-dir', default='synthetic_dataset', help='输出目录（默认 synthetic_dataset）')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子')
+    args = parser.parse_args()
+
+    rows = parse_row_count(args.rows)
+    paths = write_dataset(args.out_dir, rows, args.seed)
+    print(f"✅ 已生成 {rows} 行课程数据: {paths.course}，教室列表: {paths.classrooms}")
+
+
+if __name__ == '__main__':
+    main()
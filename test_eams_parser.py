@@ -0,0 +1,204 @@
+"""
+页面解析一致性测试
+
+两种后端（lxml、html.parser + SoupStrainer）的提取结果都应与改用 eams_parser 之前爬虫中的写法完全相同：
+对整页建立 BeautifulSoup(html, 'html.parser') 树，find('span', string='已排课') 后 find_next('table')。
+下面的 _reference_* 即为当时的代码（仅去掉了写文件和日志），页面取自模拟教务系统和若干边界情况。
+
+运行：python -m pytest test_eams_parser.py
+"""
+import pytest
+from bs4 import BeautifulSoup
+
+import eams_parser
+from eams_parser import parse_course_rows, parse_teacher_list
+from fake_eams import FakeEAMSConfig, course_table_page, teacher_list_page
+
+BASE_URL = 'http://eams.example.com'
+BACKENDS = [
+    pytest.param('html.parser'),
+    pytest.param('lxml', marks=pytest.mark.skipif(eams_parser.lxml is None, reason='未安装 lxml')),
+]
+
+
+# ===========================================
+# 改动前的提取方式
+# ===========================================
+def _reference_course_rows(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    scheduled_span = soup.find('span', string='已排课')
+
+    course_rows = []
+    if scheduled_span:
+        scheduled_table = scheduled_span.find_next('table')
+        if scheduled_table:
+            data_trs = scheduled_table.find_all('tr')[1:]
+            for tr in data_trs:
+                if tr.find('td', colspan=True):
+                    continue
+                tds = tr.find_all(['td', 'th'])
+                if not tds:
+                    continue
+                row_data = []
+                for td in tds:
+                    text = td.get_text(strip=True)
+                    row_data.append(text if text else "null")
+                while len(row_data) < 17:
+                    row_data.append("null")
+                course_rows.append(row_data[:17])
+    return course_rows
+
+
+def _reference_teacher_list(html, base_url):
+    soup = BeautifulSoup(html, 'html.parser')
+
+    teachers = []
+    for idx, a in enumerate(soup.find_all('a', href=True), start=1):
+        gender = "空"
+        department = "空"
+
+        td_name = a.find_parent('td')
+        if td_name:
+            row = td_name.find_parent('tr')
+            if row:
+                tds = row.find_all('td')
+                if len(tds) > 2:
+                    g_text = tds[2].get_text(strip=True)
+                    gender = g_text if g_text else "空"
+                if len(tds) > 3:
+                    d_text = tds[3].get_text(strip=True)
+                    department = d_text if d_text else "空"
+            else:
+                all_tds = soup.find_all('td')
+                try:
+                    i = all_tds.index(td_name)
+                    if i + 1 < len(all_tds):
+                        g_text = all_tds[i + 1].get_text(strip=True)
+                        gender = g_text if g_text else "null"
+                    if i + 2 < len(all_tds):
+                        d_text = all_tds[i + 2].get_text(strip=True)
+                        department = d_text if d_text else "null"
+                except ValueError:
+                    pass
+
+        teachers.append({
+            '序号': idx,
+            '姓名': a.get_text(strip=True),
+            '性别': gender,
+            '院系': department,
+            '链接': base_url + a['href']
+        })
+    return teachers
+
+
+# ===========================================
+# 测试页面
+# ===========================================
+FAKE_CONFIG = FakeEAMSConfig(teachers=60, max_lessons=8, seed=3)
+
+_HEADER_ROW = '<tr>' + ''.join(f'<th>列{i}</th>' for i in range(17)) + '</tr>'
+
+
+def _course_page(*rows):
+    """未排课表格 + 已排课表格，rows 为已排课表格中表头之后的 <tr> 片段"""
+    return (
+        '<html><head><script>var label = "<span>已排课</span>";</script></head><body>'
+        '<span>未排课</span><table><tr><th>课程</th></tr><tr><td>不应出现</td></tr></table>'
+        '<div><span>已排课</span></div>'
+        '<table>' + _HEADER_ROW + ''.join(rows) + '</table>'
+        '<table><tr><th>其他</th></tr><tr><td>也不应出现</td></tr></table>'
+        '</body></html>'
+    )
+
+
+def _cells(*texts):
+    return '<tr>' + ''.join(f'<td>{text}</td>' for text in texts) + '</tr>'
+
+
+_FULL_ROW = [str(i) for i in range(1, 18)]
+
+COURSE_EDGE_PAGES = {
+    '嵌套表格': _course_page(
+        _cells(*_FULL_ROW[:3], '高等数学<table><tr><td>嵌套</td><td>单元格</td></tr></table>', *_FULL_ROW[4:]),
+        _cells(*_FULL_ROW),
+    ),
+    '单元格中的注释': _course_page(
+        _cells(*_FULL_ROW[:3], '大学<!-- 旧名称：普通 -->物理', *_FULL_ROW[4:-1], '<!-- 备注 -->'),
+    ),
+    '&nbsp;': _course_page(
+        _cells(*_FULL_ROW[:5], '&nbsp;', ' &nbsp;文管A101&nbsp; ', *_FULL_ROW[7:]),
+    ),
+    'colspan 合计行': _course_page(
+        _cells(*_FULL_ROW),
+        '<tr><td colspan="17">合计：1 门课程</td></tr>',
+        '<tr><td>1</td><td colspan="2">跨列</td></tr>',
+        _cells(*_FULL_ROW[::-1]),
+    ),
+    '单元格中的 script': _course_page(
+        _cells(*_FULL_ROW[:15], '文管A101<script>document.write("<b>x</b>");</script>', '备注'),
+    ),
+    '列数不足与超出': _course_page(
+        _cells('1', '2', '3'),
+        _cells(*_FULL_ROW, '多余1', '多余2'),
+        '<tr></tr>',
+        '<tr><th>表头式单元格</th><td>数据</td></tr>',
+    ),
+    '空白与换行': _course_page(
+        '<tr>\n  <td>\n 1 \n</td>\n  <td><b> 粗体 </b> <i>斜体</i></td>\n</tr>',
+    ),
+    '没有已排课': '<html><body><span>未排课</span><table><tr><th>x</th></tr><tr><td>1</td></tr></table></body></html>',
+    '已排课后没有表格': '<html><body><table><tr><td>前</td></tr></table><span>已排课</span></body></html>',
+    '空页面': '',
+}
+
+TEACHER_EDGE_PAGES = {
+    '没有 tr 的 td': (
+        '<div>'
+        '<td><a href="/t?id=1">张三</a></td><td>男</td><td>数学学院</td>'
+        '<td><a href="/t?id=2">李四</a></td><td></td><td>物理学院</td>'
+        '<td><a href="/t?id=3">王五</a></td><td>女</td>'
+        '</div>'
+    ),
+    '不在 td 中的链接': '<p><a href="/t?id=9">赵六</a></p><a name="anchor">无链接</a>',
+    '列数不足的行': (
+        '<table><tr><td></td><td><a href="/t?id=4">孙七</a></td></tr>'
+        '<tr><td></td><td><a href="/t?id=5">周八</a></td><td>&nbsp;</td><td> 化学<!-- x -->学院 </td></tr></table>'
+    ),
+    '空页面': '',
+}
+
+
+def _course_pages():
+    pages = [(f'模拟课表 {teacher_id}', course_table_page(FAKE_CONFIG, teacher_id)) for teacher_id in range(1, 21)]
+    return pages + list(COURSE_EDGE_PAGES.items())
+
+
+def _teacher_pages():
+    pages = [(f'模拟教师列表第 {page_no} 页', teacher_list_page(FAKE_CONFIG, page_no, 25)) for page_no in (1, 3)]
+    return pages + list(TEACHER_EDGE_PAGES.items())
+
+
+# ===========================================
+# 测试
+# ===========================================
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name, html', _course_pages(), ids=[name for name, _ in _course_pages()])
+def test_course_rows_match_reference(backend, name, html):
+    assert parse_course_rows(html, backend=backend) == _reference_course_rows(html)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+@pytest.mark.parametrize('name, html', _teacher_pages(), ids=[name for name, _ in _teacher_pages()])
+def test_teacher_list_matches_reference(backend, name, html):
+    assert parse_teacher_list(html, BASE_URL, backend=backend) == _reference_teacher_list(html, BASE_URL)
+
+
+def test_fake_pages_are_not_trivial():
+    """模拟页面确实包含课程和教师，上面的一致性检查不是在比较空列表"""
+    assert sum(len(_reference_course_rows(html)) for _, html in _course_pages()) > 20
+    assert len(_reference_teacher_list(teacher_list_page(FAKE_CONFIG, 1, 25), BASE_URL)) == 25
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        parse_course_rows('', backend='html5lib')